@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Device list rendering benchmark.
+Fills the model backed list with emulated devices and measures row
+creation, per-item updates and scrolling frame times. Needs a display
+(run under Xvfb/xvfb-run on headless machines).
+
+Usage: python3 benchmarks/bench_device_list.py [--devices 100] [--rounds 5]
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '../src'))
+
+import gi  # noqa: E402
+gi.require_version('Gtk', '3.0')
+from gi.repository import Gio, Gtk  # noqa: E402
+
+from device_list import DeviceItem, DeviceRowFactory, load_row_template  # noqa: E402
+from device_manager import Device  # noqa: E402
+
+GLADE_FILE = os.path.join(BENCH_DIR, '../ui/main_window.glade')
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+def flush_events():
+    while Gtk.events_pending():
+        Gtk.main_iteration_do(False)
+
+
+def fake_device(index):
+    device = Device(f'00008030-{index:016X}')
+    device.name = f"Bench iPhone {index}"
+    device.model = 'iPhone14,5'
+    device.ios_version = '17.1.2'
+    device.storage_total = 128.0
+    device.is_trusted = index % 10 != 0
+    return device
+
+
+def bench(count, rounds):
+    window = Gtk.Window()
+    window.set_default_size(600, 400)
+    scrolled = Gtk.ScrolledWindow()
+    list_box = Gtk.ListBox()
+    scrolled.add(list_box)
+    window.add(scrolled)
+    window.show_all()
+    flush_events()
+
+    factory = DeviceRowFactory(GLADE_FILE, lambda item: None, lambda item: None)
+    # Template parsing is a one time cost, keep it out of the samples
+    factory.template = load_row_template(GLADE_FILE)
+
+    results = {}
+
+    populate = []
+    for _ in range(rounds):
+        store = Gio.ListStore(item_type=DeviceItem)
+        list_box.bind_model(store, factory.create_row)
+        items = [DeviceItem(fake_device(index)) for index in range(count)]
+
+        start = time.perf_counter()
+        store.splice(0, 0, items)
+        flush_events()
+        populate.append(time.perf_counter() - start)
+    results['populate'] = populate
+
+    updates = []
+    for round_index in range(rounds):
+        start = time.perf_counter()
+        for item in items:
+            item.is_mounted = round_index % 2 == 0
+            item.changed()
+        flush_events()
+        updates.append((time.perf_counter() - start) / count)
+    results['update per item'] = updates
+
+    adjustment = scrolled.get_vadjustment()
+    frames = []
+    steps = 50
+    for _ in range(rounds):
+        span = adjustment.get_upper() - adjustment.get_page_size()
+        for step in range(steps + 1):
+            start = time.perf_counter()
+            adjustment.set_value(span * step / steps)
+            flush_events()
+            frames.append(time.perf_counter() - start)
+    results['scroll frame'] = frames
+
+    window.destroy()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--devices', type=int, default=100)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    results = bench(args.devices, args.rounds)
+
+    print(f"{'operation':<18}{'devices':>8}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, samples in results.items():
+        print(f"{name:<18}{args.devices:>8}"
+              f"{percentile(samples, 0.50) * 1000:>10.2f}"
+              f"{percentile(samples, 0.95) * 1000:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hot path benchmark without real devices.
+Puts fake idevice_id, ideviceinfo, ifuse, fusermount and mountpoint
+executables (fake_tools.py) on PATH and measures DeviceManager and
+MountManager operations as the number of emulated devices grows.
+
+Usage: python3 benchmarks/bench_hotpaths.py [--devices 1,4,16] [--rounds 5]
+           [--latency 0.05] [--jitter 0] [--fail-rate 0] [--timeout-rate 0]
+"""
+
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '../src'))
+
+from device_manager import DeviceManager  # noqa: E402
+from mount_manager import MountManager  # noqa: E402
+
+TOOLS = ('idevice_id', 'ideviceinfo', 'idevicepair', 'ifuse', 'fusermount',
+         'mountpoint')
+
+
+def install_fake_tools(bin_dir):
+    """
+    Link every tool name to fake_tools.py and put them first on PATH.
+    """
+    fake_tools = os.path.join(BENCH_DIR, 'fake_tools.py')
+    for tool in TOOLS:
+        os.symlink(fake_tools, os.path.join(bin_dir, tool))
+    os.environ['PATH'] = bin_dir + os.pathsep + os.environ.get('PATH', '')
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+class Results:
+    """
+    Latency samples per (operation, device count).
+    """
+
+    def __init__(self):
+        self.rows = []
+
+    def add(self, operation, devices, samples, items):
+        total = sum(samples)
+        self.rows.append((
+            operation,
+            devices,
+            percentile(samples, 0.50) * 1000,
+            percentile(samples, 0.95) * 1000,
+            items / total if total else 0,
+        ))
+
+    def print(self):
+        print(f'{"operation":<16}{"devices":>8}{"p50 ms":>10}{"p95 ms":>10}{"items/s":>10}')
+        for operation, devices, p50, p95, throughput in self.rows:
+            print(f'{operation:<16}{devices:>8}{p50:>10.1f}{p95:>10.1f}{throughput:>10.1f}')
+
+
+def write_fake_mountinfo(path, base_dir, count):
+    with open(path, 'w') as f:
+        for index in range(count):
+            f.write(
+                f'{100 + index} 30 0:{60 + index} / {base_dir}/Bench_{index} '
+                'rw,nosuid,nodev - fuse.ifuse ifuse rw\n'
+            )
+
+
+def bench_device_count(count, rounds, results, work_dir):
+    os.environ['FAKE_IDEVICE_COUNT'] = str(count)
+
+    # Cold scans, every round starts without cache
+    samples = []
+    devices = []
+    for _ in range(rounds):
+        manager = DeviceManager()
+        devices, duration = timed(manager.refresh_devices)
+        manager.close()
+        samples.append(duration)
+    results.add('scan cold', count, samples, count * rounds)
+
+    # Warm scans of already known devices
+    manager = DeviceManager()
+    manager.refresh_devices()
+    samples = [timed(manager.refresh_devices)[1] for _ in range(rounds)]
+    manager.close()
+    results.add('scan warm', count, samples, count * rounds)
+
+    base_dir = os.path.join(work_dir, f'mounts-{count}')
+    mount_manager = MountManager(base_dir, supervise=False)
+
+    mount_samples = []
+    unmount_samples = []
+    for _ in range(rounds):
+        mount_points = []
+        for device in devices:
+            (success, mount_point, _error), duration = timed(
+                mount_manager.mount_device, device
+            )
+            mount_samples.append(duration)
+            if success:
+                mount_points.append(mount_point)
+
+        for mount_point in mount_points:
+            unmount_samples.append(timed(mount_manager.unmount_device, mount_point)[1])
+
+    if mount_samples:
+        results.add('mount', count, mount_samples, len(mount_samples))
+    if unmount_samples:
+        results.add('unmount', count, unmount_samples, len(unmount_samples))
+
+    # Batch mount/unmount of all devices
+    samples = []
+    for _ in range(rounds):
+        (batch_results, _summary), duration = timed(mount_manager.mount_all, devices)
+        samples.append(duration)
+        mount_points = [result['mount_point'] for result in batch_results
+                        if result['success']]
+        for mount_point in mount_points:
+            mount_manager.unmount_device(mount_point)
+    results.add('mount all', count, samples, count * rounds)
+
+    # Cleanup with one listed mount per device, the plain directories
+    # answer the endpoint probe so only the probe cost is measured
+    mountinfo = os.path.join(work_dir, f'mountinfo-{count}')
+    write_fake_mountinfo(mountinfo, base_dir, count)
+    mount_manager.mount_table.path = mountinfo
+    samples = []
+    for _ in range(rounds):
+        for index in range(count):
+            os.makedirs(os.path.join(base_dir, f'Bench_{index}'), exist_ok=True)
+        samples.append(timed(mount_manager.cleanup_stale_mounts)[1])
+    results.add('cleanup', count, samples, count * rounds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--devices', default='1,4,16',
+                        help='comma separated device counts (default: %(default)s)')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='seconds per tool call (default: %(default)s)')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    parser.add_argument('--timeout-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    os.environ['FAKE_IDEVICE_LATENCY'] = str(args.latency)
+    os.environ['FAKE_IDEVICE_JITTER'] = str(args.jitter)
+    os.environ['FAKE_IDEVICE_FAIL_RATE'] = str(args.fail_rate)
+    os.environ['FAKE_IDEVICE_TIMEOUT_RATE'] = str(args.timeout_rate)
+
+    results = Results()
+    with tempfile.TemporaryDirectory(prefix='idevice-bench-') as work_dir:
+        bin_dir = os.path.join(work_dir, 'bin')
+        os.mkdir(bin_dir)
+        install_fake_tools(bin_dir)
+
+        for count in (int(value) for value in args.devices.split(',')):
+            bench_device_count(count, args.rounds, results, work_dir)
+
+    results.print()
+
+
+if __name__ == '__main__':
+    main()
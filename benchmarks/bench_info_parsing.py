@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark for ideviceinfo output parsing.
+Compares the old line-splitting parser against the plist layer for one
+scan (base, disk_usage and battery queries of a single device), and
+both against starting the ideviceinfo process that produces the output.
+Every round parses outputs it has not seen before, as a real scan does.
+
+Usage: python3 benchmarks/bench_info_parsing.py [iterations]
+"""
+
+import os
+import plistlib
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../src'))
+
+import device_manager  # noqa: E402
+
+
+def sample_outputs(round_number):
+    """
+    Build representative base, disk_usage and battery outputs, the
+    volatile values differ per round.
+    """
+    base = {
+        'DeviceName': "Emel's iPhone",
+        'ProductType': 'iPhone14,5',
+        'ProductVersion': '17.1.2',
+        'BuildVersion': '21B101',
+        'SerialNumber': 'F2LXK0AAAAAA',
+        'HardwareModel': 'D17AP',
+        'WiFiAddress': 'a4:83:e7:00:00:01',
+        'BluetoothAddress': 'a4:83:e7:00:00:02',
+        'SupportedDeviceFamilies': [1],
+        'NonVolatileRAM': {'auto-boot': b'true', 'backlight-level': b'1528'},
+    }
+    # Pad with the usual amount of lockdown values
+    for i in range(90):
+        base[f'LockdownValue{i}'] = f'value-{i}' if i % 2 else i
+
+    disk_usage = {
+        'TotalDiskCapacity': 128000000000,
+        'TotalDataAvailable': 64000000000 - round_number * 4096,
+        'TotalDataCapacity': 110000000000,
+        'TotalSystemCapacity': 12000000000,
+        'TotalSystemAvailable': 2000000000,
+        'AmountDataAvailable': 64000000000,
+        'AmountDataReserved': 200000000,
+        'CalculateDiskUsage': 'OkilyDokily',
+        'NANDInfo': b'\x00' * 64,
+    }
+    battery = {
+        'BatteryCurrentCapacity': round_number % 101,
+        'BatteryIsCharging': True,
+        'ExternalChargeCapable': True,
+        'ExternalConnected': True,
+        'FullyCharged': False,
+        'HasBattery': True,
+    }
+    return [base, disk_usage, battery]
+
+
+def to_text(data):
+    """
+    Render a dict the way plain `ideviceinfo` prints it.
+    """
+    return '\n'.join(f'{key}: {value}' for key, value in data.items()) + '\n'
+
+
+def parse_text(output):
+    """
+    The previous line-splitting parser.
+    """
+    data = {}
+    for line in output.split('\n'):
+        if ':' in line:
+            key, value = line.split(':', 1)
+            data[key.strip()] = value.strip()
+    return data
+
+
+def measure(func, outputs):
+    """
+    Average microseconds of func over the per round outputs.
+    """
+    start = time.perf_counter()
+    for round_outputs in outputs:
+        func(round_outputs)
+    return (time.perf_counter() - start) / len(outputs) * 1e6
+
+
+def text_scan(outputs):
+    for output in outputs:
+        data = parse_text(output)
+        int(data.get('TotalDiskCapacity', 0) or 0)
+
+
+def plist_scan(outputs):
+    for output in outputs:
+        device_manager.parse_plist_output(output)
+
+
+def spawn_scan(outputs):
+    # One process per query, what a scan pays before any parsing
+    for _output in outputs:
+        subprocess.run(['true'], check=False)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    samples = [sample_outputs(i) for i in range(iterations)]
+    text_outputs = [[to_text(data) for data in scan] for scan in samples]
+    xml_outputs = [[plistlib.dumps(data) for data in scan] for scan in samples]
+
+    results = [
+        ('text (3 passes)', measure(text_scan, text_outputs)),
+        ('plist', measure(plist_scan, xml_outputs)),
+        ('3 processes', measure(spawn_scan, xml_outputs[:max(1, iterations // 20)])),
+    ]
+
+    print(f'{"parser":<18}{"us/scan":>10}')
+    for name, micros in results:
+        print(f'{name:<18}{micros:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
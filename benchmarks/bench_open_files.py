@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Busy mount scan benchmark.
+Starts many idle processes with open files and measures how long
+find_holders takes to find (or rule out) the processes using a
+directory. No mount is needed, a temporary directory stands in for it.
+
+Usage: python3 benchmarks/bench_open_files.py [--processes 2000] [--rounds 20]
+"""
+
+import argparse
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '../src'))
+
+from open_files import find_holders  # noqa: E402
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+def spawn_idle(count, cwd, open_file):
+    """
+    Idle processes holding a few descriptors each, outside the target.
+    """
+    processes = []
+    for _ in range(count):
+        with open(open_file, 'rb') as stdin:
+            processes.append(subprocess.Popen(
+                ['sleep', '600'], cwd=cwd, stdin=stdin,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            ))
+    return processes
+
+
+def measure(target, rounds, **kwargs):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        find_holders(target, **kwargs)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench(count, rounds):
+    """
+    Returns samples per scan and the number of processes scanned.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as other, tempfile.TemporaryDirectory() as target:
+        other_file = os.path.join(other, 'file')
+        target_file = os.path.join(target, 'file')
+        for path in (other_file, target_file):
+            with open(path, 'wb'):
+                pass
+
+        processes = spawn_idle(count, other, other_file)
+        try:
+            total = sum(1 for name in os.listdir('/proc') if name.isdigit())
+            results['not busy'] = measure(target, rounds)
+
+            # Youngest process holds the file, found last
+            processes += spawn_idle(1, other, target_file)
+            results['busy, all'] = measure(target, rounds)
+            results['busy, first'] = measure(target, rounds, limit=1)
+        finally:
+            for process in processes:
+                process.kill()
+            for process in processes:
+                process.wait()
+
+    return results, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--processes', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    results, total = bench(args.processes, args.rounds)
+
+    print(f"{'scan':<14}{'processes':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, samples in results.items():
+        print(f"{name:<14}{total:>10}"
+              f"{percentile(samples, 0.50) * 1000:>10.2f}"
+              f"{percentile(samples, 0.95) * 1000:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Native usbmuxd backend benchmark without real devices.
+Runs fake_usbmuxd.py in-process, points the client at it with
+USBMUXD_SOCKET_ADDRESS and measures DeviceManager(backend='usbmux')
+scans and HotplugMonitor event delivery. No idevice tools are put on
+PATH, a scan that falls back to them loses the device.
+
+Usage: python3 benchmarks/bench_usbmux.py [--devices 1,4,16] [--unpaired 1]
+           [--rounds 5] [--latency 0.002]
+"""
+
+import argparse
+import os
+import queue
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '../src'))
+
+from bench_hotpaths import Results, timed  # noqa: E402
+from device_manager import DeviceManager  # noqa: E402
+from fake_usbmuxd import FakeUsbmuxd  # noqa: E402
+from hotplug import HotplugMonitor  # noqa: E402
+
+EVENT_TIMEOUT = 5
+
+
+def check_devices(devices, server):
+    """
+    Every device was found, with the trust state of its pair record.
+    """
+    expected = {udid: udid in server.paired for udid in server.devices.values()}
+    found = {device.udid: device.is_trusted for device in devices}
+    if found != expected:
+        raise SystemExit(f"scan mismatch: expected {expected}, got {found}")
+
+
+def bench_scans(count, unpaired, rounds, results, work_dir, latency):
+    server = FakeUsbmuxd(
+        os.path.join(work_dir, f'usbmuxd-{count}'), count, unpaired, latency
+    ).start()
+    os.environ['USBMUXD_SOCKET_ADDRESS'] = f'UNIX:{server.path}'
+    try:
+        samples = []
+        for _ in range(rounds):
+            manager = DeviceManager(backend='usbmux')
+            devices, duration = timed(manager.refresh_devices)
+            manager.close()
+            check_devices(devices, server)
+            samples.append(duration)
+        results.add('scan cold', count, samples, count * rounds)
+
+        manager = DeviceManager(backend='usbmux')
+        manager.refresh_devices()
+        samples = []
+        for _ in range(rounds):
+            devices, duration = timed(manager.refresh_devices)
+            check_devices(devices, server)
+            samples.append(duration)
+        manager.close()
+        results.add('scan warm', count, samples, count * rounds)
+    finally:
+        server.stop()
+
+
+def wait_event(events, expected):
+    try:
+        event = events.get(timeout=EVENT_TIMEOUT)
+    except queue.Empty:
+        raise SystemExit(f"hotplug: no {expected} event") from None
+    if event != expected:
+        raise SystemExit(f"hotplug: expected {expected}, got {event}")
+
+
+def bench_hotplug(count, rounds, results, work_dir):
+    """
+    Initial attach events, then detach, attach and pair of one device.
+    """
+    server = FakeUsbmuxd(os.path.join(work_dir, 'usbmuxd-hotplug'), count, count).start()
+    os.environ['USBMUXD_SOCKET_ADDRESS'] = f'UNIX:{server.path}'
+    events = queue.Queue()
+
+    def report(kind):
+        return lambda udid: events.put((kind, udid))
+
+    monitor = HotplugMonitor(report('attach'), report('detach'), report('paired'))
+    start = time.perf_counter()
+    monitor.start()
+    try:
+        for udid in server.devices.values():
+            wait_event(events, ('attach', udid))
+        results.add('listen', count, [time.perf_counter() - start], count)
+
+        udid = next(iter(server.devices.values()))
+        samples = []
+        for _ in range(rounds):
+            for kind, change in (('detach', server.detach), ('attach', server.attach),
+                                 ('paired', server.pair)):
+                sent = time.perf_counter()
+                change(udid)
+                wait_event(events, (kind, udid))
+                samples.append(time.perf_counter() - sent)
+        results.add('hotplug event', count, samples, len(samples))
+    finally:
+        monitor.stop()
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--devices', default='1,4,16',
+                        help='comma separated device counts (default: %(default)s)')
+    parser.add_argument('--unpaired', type=int, default=1,
+                        help='untrusted devices per scan (default: %(default)s)')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.002,
+                        help='seconds per usbmuxd/lockdown request (default: %(default)s)')
+    args = parser.parse_args()
+
+    results = Results()
+    with tempfile.TemporaryDirectory(prefix='usbmux-bench-') as work_dir:
+        # Fallbacks to the idevice tools fail instead of finding real ones
+        os.environ['PATH'] = work_dir
+        for count in (int(value) for value in args.devices.split(',')):
+            bench_scans(count, min(args.unpaired, count), args.rounds, results,
+                        work_dir, args.latency)
+            bench_hotplug(count, args.rounds, results, work_dir)
+
+    results.print()
+
+
+if __name__ == '__main__':
+    main()
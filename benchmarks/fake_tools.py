@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stand-in for idevice_id, ideviceinfo, idevicepair, ifuse, fusermount and
+mountpoint.
+The tool is selected by the name it is called with (symlink), behaviour
+is configured with environment variables:
+
+    FAKE_IDEVICE_COUNT         number of emulated devices (default 1)
+    FAKE_IDEVICE_LATENCY       seconds per call (default 0.05)
+    FAKE_IDEVICE_JITTER        extra random seconds per call (default 0)
+    FAKE_IDEVICE_FAIL_RATE     probability of a failing call (default 0)
+    FAKE_IDEVICE_TIMEOUT_RATE  probability of a hanging call (default 0)
+    FAKE_IDEVICE_HANG          seconds a hanging call sleeps (default 60)
+"""
+
+import os
+import plistlib
+import random
+import sys
+import time
+
+
+def env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def fake_udid(index):
+    return f"00008101-{index:016X}"
+
+
+def simulate_call():
+    """
+    Sleep like a real call, exit on emulated failures.
+    """
+    if random.random() < env_float('FAKE_IDEVICE_TIMEOUT_RATE', 0):
+        time.sleep(env_float('FAKE_IDEVICE_HANG', 60))
+
+    latency = env_float('FAKE_IDEVICE_LATENCY', 0.05)
+    latency += random.random() * env_float('FAKE_IDEVICE_JITTER', 0)
+    time.sleep(latency)
+
+    if random.random() < env_float('FAKE_IDEVICE_FAIL_RATE', 0):
+        sys.stderr.write("ERROR: Could not connect to lockdownd, error code -5\n")
+        sys.exit(255)
+
+
+def idevice_id(args):
+    count = int(env_float('FAKE_IDEVICE_COUNT', 1))
+    for index in range(count):
+        print(fake_udid(index))
+
+
+def info_values(udid, domain=None):
+    """
+    Lockdown values of an emulated device, also served by fake_usbmuxd.py.
+    """
+    if domain == 'com.apple.disk_usage':
+        data = {
+            'TotalDiskCapacity': 128000000000,
+            'TotalDataAvailable': random.randint(1, 64) * 1000000000,
+        }
+    elif domain == 'com.apple.mobile.battery':
+        data = {
+            'BatteryCurrentCapacity': random.randint(1, 100),
+            'BatteryIsCharging': random.random() < 0.5,
+        }
+    else:
+        data = {
+            'DeviceName': f"Bench iPhone {udid[-4:]}",
+            'ProductType': 'iPhone14,5',
+            'ProductVersion': '17.1.2',
+            'BuildVersion': '21B101',
+            'SerialNumber': udid[-12:],
+            'HardwareModel': 'D17AP',
+            'UniqueDeviceID': udid,
+        }
+        for index in range(90):
+            data[f'LockdownValue{index}'] = f'value-{index}'
+    return data
+
+
+def ideviceinfo(args):
+    udid = args[args.index('-u') + 1] if '-u' in args else fake_udid(0)
+    domain = args[args.index('-q') + 1] if '-q' in args else None
+    key = args[args.index('-k') + 1] if '-k' in args else None
+
+    data = info_values(udid, domain)
+    if key:
+        data = data.get(key, '')
+
+    if '-x' in args:
+        sys.stdout.buffer.write(plistlib.dumps(data))
+    elif isinstance(data, dict):
+        for name, value in data.items():
+            print(f"{name}: {value}")
+    else:
+        print(data)
+
+
+def idevicepair(args):
+    # Every fake device is paired
+    pass
+
+
+def ifuse(args):
+    # Real ifuse daemonizes after mounting
+    pass
+
+
+def fusermount(args):
+    pass
+
+
+def mountpoint(args):
+    # Nothing is really mounted
+    sys.exit(1)
+
+
+TOOLS = {
+    'idevice_id': idevice_id,
+    'ideviceinfo': ideviceinfo,
+    'idevicepair': idevicepair,
+    'ifuse': ifuse,
+    'fusermount': fusermount,
+    'mountpoint': mountpoint,
+}
+
+
+def main():
+    tool = TOOLS.get(os.path.basename(sys.argv[0]))
+    if tool is None:
+        sys.stderr.write(f"Unknown tool: {sys.argv[0]}\n")
+        sys.exit(2)
+
+    simulate_call()
+    tool(sys.argv[1:])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stand-in usbmuxd for the native backend and the hotplug monitor.
+Serves ListDevices, ReadPairRecord, Listen (Attached, Detached and
+Paired events) and Connect to the lockdown port, where QueryType,
+StartSession, GetValue and StopSession are answered with the values of
+fake_tools.py. Sessions are never switched to SSL. Without a session
+only the public base values are readable, like on an untrusted device.
+
+Clients are pointed at it with USBMUXD_SOCKET_ADDRESS=UNIX:<socket>.
+
+Usage: python3 benchmarks/fake_usbmuxd.py <socket> [--devices 1] [--unpaired 0]
+           [--latency 0]
+"""
+
+import argparse
+import os
+import plistlib
+import socket
+import struct
+import sys
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_tools import fake_udid, info_values  # noqa: E402
+
+# usbmuxd header: length, version, message type, tag
+HEADER = struct.Struct('<IIII')
+PROTOCOL_VERSION = 1
+MESSAGE_PLIST = 8
+
+LOCKDOWN_PORT = 62078
+
+# usbmuxd result numbers
+RESULT_OK = 0
+RESULT_BAD_DEVICE = 2
+RESULT_CONNECTION_REFUSED = 3
+
+# Base values a device answers without a session
+PUBLIC_KEYS = ('DeviceName', 'ProductType', 'ProductVersion', 'BuildVersion',
+               'UniqueDeviceID')
+
+
+class _Closed(Exception):
+    pass
+
+
+def _recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise _Closed()
+        data.extend(chunk)
+    return bytes(data)
+
+
+class FakeUsbmuxd:
+    """
+    usbmuxd on a UNIX socket, one thread per client connection.
+    Devices are numbered from 1, attach(), detach() and pair() change
+    them and notify listening clients. requests counts handled
+    usbmuxd and lockdown requests by type.
+    """
+
+    def __init__(self, path, count=1, unpaired=0, latency=0.0):
+        self.path = path
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.listeners = []
+        self.requests = {}
+        self.stopped = False
+
+        # device id -> udid, and the udids with a pair record
+        self.all_devices = {index + 1: fake_udid(index) for index in range(count)}
+        self.devices = dict(self.all_devices)
+        self.paired = set(list(self.devices.values())[unpaired:])
+
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if os.path.exists(path):
+            os.unlink(path)
+        self.server.bind(path)
+        self.server.listen(64)
+
+    def start(self):
+        threading.Thread(target=self._accept, name='fake-usbmuxd', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.stopped = True
+        try:
+            self.server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.server.close()
+        with self.lock:
+            listeners = list(self.listeners)
+            self.listeners.clear()
+        for client in listeners:
+            client.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def attach(self, udid):
+        device_id = self._device_id(udid, self.all_devices)
+        with self.lock:
+            self.devices[device_id] = udid
+        self._notify(self._attached(device_id, udid))
+
+    def detach(self, udid):
+        device_id = self._device_id(udid, self.devices)
+        with self.lock:
+            self.devices.pop(device_id, None)
+        self._notify({'MessageType': 'Detached', 'DeviceID': device_id})
+
+    def pair(self, udid):
+        """
+        Like accepting the "Trust" prompt on the device.
+        """
+        with self.lock:
+            self.paired.add(udid)
+        self._notify({'MessageType': 'Paired',
+                      'DeviceID': self._device_id(udid, self.devices)})
+
+    @staticmethod
+    def _device_id(udid, devices):
+        return next(device_id for device_id, known in devices.items() if known == udid)
+
+    @staticmethod
+    def _attached(device_id, udid):
+        return {
+            'MessageType': 'Attached',
+            'DeviceID': device_id,
+            'Properties': {
+                'SerialNumber': udid,
+                'ConnectionType': 'USB',
+                'DeviceID': device_id,
+            },
+        }
+
+    def _count(self, request):
+        with self.lock:
+            self.requests[request] = self.requests.get(request, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _notify(self, message):
+        with self.lock:
+            listeners = list(self.listeners)
+        for client in listeners:
+            try:
+                self._send(client, message)
+            except OSError:
+                with self.lock:
+                    if client in self.listeners:
+                        self.listeners.remove(client)
+
+    def _accept(self):
+        while not self.stopped:
+            try:
+                client, _address = self.server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    @staticmethod
+    def _send(client, message, tag=0):
+        payload = plistlib.dumps(message)
+        client.sendall(HEADER.pack(
+            HEADER.size + len(payload), PROTOCOL_VERSION, MESSAGE_PLIST, tag
+        ) + payload)
+
+    def _serve(self, client):
+        try:
+            while True:
+                length, _version, _type, tag = HEADER.unpack(
+                    _recv_exact(client, HEADER.size))
+                message = plistlib.loads(_recv_exact(client, length - HEADER.size))
+                if not self._handle(client, message, tag):
+                    return
+        except (_Closed, OSError):
+            client.close()
+
+    def _handle(self, client, message, tag):
+        """
+        Answers one usbmuxd request.
+        Returns False once the connection is handed to another protocol.
+        """
+        message_type = message.get('MessageType')
+        self._count(message_type)
+
+        if message_type == 'ListDevices':
+            with self.lock:
+                devices = list(self.devices.items())
+            self._send(client, {'DeviceList': [
+                self._attached(device_id, udid) for device_id, udid in devices
+            ]}, tag)
+
+        elif message_type == 'ReadPairRecord':
+            udid = message.get('PairRecordID')
+            if udid in self.paired:
+                record = {
+                    'HostID': 'FAKE-HOST',
+                    'SystemBUID': 'FAKE-BUID',
+                    'HostCertificate': b'',
+                    'HostPrivateKey': b'',
+                }
+                self._send(client, {'PairRecordData': plistlib.dumps(record)}, tag)
+            else:
+                self._send(client, {'MessageType': 'Result', 'Number': RESULT_BAD_DEVICE}, tag)
+
+        elif message_type == 'Listen':
+            self._send(client, {'MessageType': 'Result', 'Number': RESULT_OK}, tag)
+            # Connected devices are reported right after subscribing
+            with self.lock:
+                devices = list(self.devices.items())
+                self.listeners.append(client)
+            for device_id, udid in devices:
+                self._send(client, self._attached(device_id, udid))
+            return False
+
+        elif message_type == 'Connect':
+            udid = self.devices.get(message.get('DeviceID'))
+            port = socket.ntohs(message.get('PortNumber', 0))
+            if udid is None or port != LOCKDOWN_PORT:
+                self._send(client, {'MessageType': 'Result',
+                                    'Number': RESULT_CONNECTION_REFUSED}, tag)
+                return True
+            self._send(client, {'MessageType': 'Result', 'Number': RESULT_OK}, tag)
+            self._serve_lockdown(client, udid)
+            return False
+
+        else:
+            self._send(client, {'MessageType': 'Result', 'Number': 1}, tag)
+        return True
+
+    def _serve_lockdown(self, client, udid):
+        session = False
+        while True:
+            (length,) = struct.unpack('>I', _recv_exact(client, 4))
+            message = plistlib.loads(_recv_exact(client, length))
+            request = message.get('Request')
+            self._count(request)
+            response = {'Request': request}
+
+            if request == 'QueryType':
+                response['Type'] = 'com.apple.mobile.lockdown'
+            elif request == 'StartSession':
+                if udid in self.paired:
+                    session = True
+                    response['SessionID'] = f'session-{udid}'
+                    response['EnableSessionSSL'] = False
+                else:
+                    response['Error'] = 'InvalidHostID'
+            elif request == 'StopSession':
+                session = False
+            elif request == 'GetValue':
+                domain = message.get('Domain')
+                value = info_values(udid, domain)
+                if not session:
+                    value = None if domain else {
+                        key: value[key] for key in PUBLIC_KEYS if key in value
+                    }
+                if value is not None and message.get('Key'):
+                    value = value.get(message['Key'])
+                if value is None:
+                    response['Error'] = 'MissingValue'
+                else:
+                    response['Value'] = value
+            else:
+                response['Error'] = 'InvalidRequest'
+
+            payload = plistlib.dumps(response)
+            client.sendall(struct.pack('>I', len(payload)) + payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('socket')
+    parser.add_argument('--devices', type=int, default=1)
+    parser.add_argument('--unpaired', type=int, default=0,
+                        help='devices without a pair record (default: %(default)s)')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds per request (default: %(default)s)')
+    args = parser.parse_args()
+
+    server = FakeUsbmuxd(args.socket, args.devices, args.unpaired, args.latency)
+    server.start()
+    print(f"USBMUXD_SOCKET_ADDRESS=UNIX:{args.socket}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
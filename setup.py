@@ -48,10 +48,22 @@ data_files = [
         "/usr/share/pardus/pardus-idevice-mounter/src",
         [
             "src/main.py",
+            "src/cli.py",
+            "src/async_runner.py",
+            "src/command_runner.py",
             "src/main_window.py",
+            "src/device_list.py",
             "src/device_manager.py",
+            "src/device_monitor.py",
+            "src/device_snapshot.py",
             "src/mount_manager.py",
+            "src/mount_table.py",
+            "src/mount_watcher.py",
+            "src/open_files.py",
+            "src/hotplug.py",
+            "src/usbmux.py",
             "src/logger_config.py",
+            "src/startup_profile.py",
             "src/__version__",
         ],
     ),
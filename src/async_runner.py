@@ -0,0 +1,266 @@
+#!/usr/bin/python3
+"""
+Asynchronous command execution on the GLib main loop.
+Commands run through Gio.Subprocess and report back as main loop
+callbacks, no thread is kept per command. Used by the window only,
+the core modules stay free of gi so the command line runs without it.
+"""
+
+import errno
+import os
+import signal
+import subprocess
+import time
+from functools import partial
+from gi.repository import Gio, GLib
+from command_runner import Cancelled, Span, finish_span
+from device_manager import ScanState
+from logger_config import get_logger
+
+logger = get_logger('async_runner')
+
+# Starts each command as the leader of its own process group, the
+# launcher of Gio.Subprocess has no start_new_session
+SETSID = 'setsid'
+
+
+def _call_soon(callback, *args):
+    """
+    Calls callback on the next main loop iteration.
+    """
+    def call():
+        callback(*args)
+        return False
+    GLib.idle_add(call)
+
+
+def _kill_group(process):
+    """
+    Kills the process group of a command started through setsid.
+    Safe to call from any thread, it only sends a signal.
+    """
+    pid = process.get_identifier()
+    if pid is None:
+        # Already exited and reaped
+        return
+    try:
+        os.killpg(int(pid), signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        process.force_exit()
+
+
+def run_async(command, timeout, callback, udid=None, label=None, token=None,
+              deadline=None, text=False):
+    """
+    Asynchronous run_command, a span is recorded the same way.
+    callback(result, error) is called on the main loop with a
+    subprocess.CompletedProcess or the exception run_command would have
+    raised (TimeoutExpired, Cancelled, FileNotFoundError, OSError).
+    Like run_command, the whole process group of the command is killed
+    on timeout or cancel.
+    """
+    if token and token.cancelled:
+        _call_soon(callback, None, Cancelled())
+        return
+    if deadline:
+        timeout = deadline.timeout(timeout)
+        if timeout <= 0:
+            _call_soon(callback, None, subprocess.TimeoutExpired(command, 0))
+            return
+
+    span = Span(command, label, udid, timeout)
+    start = time.monotonic()
+    flags = Gio.SubprocessFlags.STDOUT_PIPE | Gio.SubprocessFlags.STDERR_PIPE
+    # setsid would only report a missing tool through its exit status
+    if GLib.find_program_in_path(command[0]) is None:
+        finish_span(span, time.monotonic() - start)
+        _call_soon(callback, None, FileNotFoundError(
+            errno.ENOENT, "No such file or directory", command[0]))
+        return
+    try:
+        process = Gio.Subprocess.new([SETSID] + list(command), flags)
+    except GLib.Error as e:
+        finish_span(span, time.monotonic() - start)
+        if e.matches(GLib.spawn_error_quark(), GLib.SpawnError.NOENT):
+            error = FileNotFoundError(errno.ENOENT, e.message, SETSID)
+        else:
+            error = OSError(e.message)
+        _call_soon(callback, None, error)
+        return
+
+    def on_timeout():
+        span.timed_out = True
+        _kill_group(process)
+        return False
+
+    def on_cancel():
+        # Runs in the thread that cancelled, e.g. during shutdown when
+        # the main loop may not get to an idle callback anymore
+        _kill_group(process)
+
+    timeout_id = GLib.timeout_add(int(timeout * 1000), on_timeout)
+    unregister = token.on_cancel(on_cancel) if token else None
+
+    def on_finished(process, async_result):
+        if not span.timed_out:
+            GLib.source_remove(timeout_id)
+        if unregister:
+            unregister()
+
+        try:
+            if text:
+                _ok, stdout, stderr = process.communicate_utf8_finish(async_result)
+            else:
+                _ok, stdout, stderr = process.communicate_finish(async_result)
+                stdout = stdout.get_data() if stdout else b''
+                stderr = stderr.get_data() if stderr else b''
+        except GLib.Error as e:
+            finish_span(span, time.monotonic() - start)
+            callback(None, OSError(e.message))
+            return
+
+        if process.get_if_exited():
+            span.returncode = process.get_exit_status()
+        else:
+            span.returncode = -process.get_term_sig()
+        finish_span(span, time.monotonic() - start)
+
+        if span.timed_out:
+            callback(None, subprocess.TimeoutExpired(command, timeout, stdout, stderr))
+        elif token and token.cancelled:
+            callback(None, Cancelled())
+        else:
+            callback(subprocess.CompletedProcess(
+                command, span.returncode, stdout, stderr), None)
+
+    if text:
+        process.communicate_utf8_async(None, None, on_finished)
+    else:
+        process.communicate_async(None, None, on_finished)
+
+
+class AsyncScan:
+    """
+    Device scan on the main loop.
+    Queries that are a single tool run go through run_async, the others
+    (pairing check, native usbmuxd backend) through the worker pool of
+    the DeviceManager. on_device(device) is called as each device is
+    ready and on_finished(devices) once at the end, on the main loop.
+    Scans the given UDIDs, or all connected devices if udids is None.
+    """
+
+    def __init__(self, device_manager, on_device=None, on_finished=None, udids=None):
+        self.device_manager = device_manager
+        self.on_device = on_device
+        self.on_finished = on_finished
+        self.udids = udids
+        self.scan = None
+        self.pending = 0
+        self.deadline_id = None
+        self.done = False
+
+    def start(self):
+        if self.udids is not None:
+            self._start_queries(self.udids)
+        elif self.device_manager.use_usbmux:
+            future = self.device_manager.executor.submit(
+                self.device_manager.get_connected_devices)
+            future.add_done_callback(
+                lambda future: _call_soon(self._on_device_list_future, future))
+        else:
+            logger.info("Running idevice_id -l to detect devices")
+            command, parse = self.device_manager.device_list_command()
+            run_async(callback=partial(self._on_device_list, parse), **command)
+
+    def _on_device_list(self, parse, result, error):
+        if isinstance(error, Cancelled):
+            logger.info("Device detection cancelled")
+            self._start_queries([])
+        else:
+            self._start_queries(parse(result, error))
+
+    def _on_device_list_future(self, future):
+        try:
+            udids = future.result()
+        except Exception as e:
+            logger.error("Error getting connected devices: %s", e)
+            udids = []
+        self._start_queries(udids)
+
+    def covers(self, udid):
+        """
+        Whether the running scan queries udid, or may still do so
+        because the device list has not arrived yet.
+        """
+        return not self.done and (self.udids is None or udid in self.udids)
+
+    def _start_queries(self, udids):
+        self.udids = udids
+        self.scan = ScanState(self.device_manager, udids)
+        queries = self.scan.start()
+        if not queries:
+            self._finish()
+            return
+
+        self.deadline_id = GLib.timeout_add(
+            int(self.scan.deadline.seconds * 1000), self._on_deadline)
+        for udid, query in queries:
+            self._submit(udid, query)
+
+    def _submit(self, udid, query):
+        self.pending += 1
+        spec = self.device_manager.query_command(udid, query)
+        if spec is None:
+            future = self.device_manager.submit_query(udid, query, self.scan.deadline)
+            future.add_done_callback(
+                lambda future: _call_soon(self._on_future, udid, query, future))
+            return
+
+        command, parse = spec
+        run_async(
+            callback=partial(self._on_command, udid, query, parse),
+            deadline=self.scan.deadline,
+            **command
+        )
+
+    def _on_command(self, udid, query, parse, result, error):
+        value = None if isinstance(error, Cancelled) else parse(result, error)
+        self._on_result(udid, query, value)
+
+    def _on_future(self, udid, query, future):
+        try:
+            value = future.result()
+        except Cancelled:
+            value = None
+        except Exception as e:
+            logger.warning("Query %s failed for %s: %s", query, udid, e)
+            value = None
+        self._on_result(udid, query, value)
+
+    def _on_result(self, udid, query, value):
+        self.pending -= 1
+        if self.done:
+            return
+
+        follow_up, device = self.scan.result(udid, query, value)
+        for next_udid, next_query in follow_up:
+            self._submit(next_udid, next_query)
+        if device and self.on_device:
+            self.on_device(device)
+
+        if self.pending == 0:
+            self._finish()
+
+    def _on_deadline(self):
+        self.deadline_id = None
+        self.scan.give_up()
+        self._finish()
+        return False
+
+    def _finish(self):
+        self.done = True
+        if self.deadline_id is not None:
+            GLib.source_remove(self.deadline_id)
+            self.deadline_id = None
+        if self.on_finished:
+            self.on_finished(self.scan.devices())
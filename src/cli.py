@@ -0,0 +1,189 @@
+#!/usr/bin/python3
+"""
+Headless command line interface for scripted multi-device workflows.
+Does not import gi/Gtk, results are printed as JSON with per-step timings.
+
+Usage:
+    pardus-idevice-mounter list [--json]
+    pardus-idevice-mounter info UDID
+    pardus-idevice-mounter mount UDID... | --all [--open]
+    pardus-idevice-mounter unmount UDID... | --all [--wait]
+    pardus-idevice-mounter cleanup
+"""
+
+import sys
+import time
+from pathlib import Path
+from command_runner import METRICS_FILE, metrics
+from device_manager import DeviceManager
+from logger_config import get_logger, setup_logging
+from mount_manager import BATCH_JOBS, MountManager
+
+logger = get_logger('cli')
+
+COMMANDS = ('list', 'info', 'mount', 'unmount', 'cleanup')
+
+
+def is_cli_command(argv):
+    return bool(argv) and argv[0] in COMMANDS
+
+
+class Timer:
+    """
+    Collects per-step durations in milliseconds.
+    """
+
+    def __init__(self):
+        self.timings = {}
+
+    def step(self, name, func, *args):
+        start = time.monotonic()
+        try:
+            return func(*args)
+        finally:
+            self.timings[name] = round((time.monotonic() - start) * 1000, 1)
+
+
+def _print_json(data):
+    import json
+    json.dump(data, sys.stdout, indent=2, ensure_ascii=False)
+    sys.stdout.write('\n')
+
+
+def cmd_list(args, timer):
+    devices = timer.step('scan', DeviceManager().refresh_devices)
+
+    if not args.json:
+        for device in devices:
+            storage = f"{device.storage_total:.0f}GB" if device.storage_total else "-"
+            trust = "trusted" if device.is_trusted else "not trusted"
+            print(f"{device.udid}\t{device.name or '-'}\t"
+                  f"iOS {device.ios_version or '-'}\t{storage}\t{trust}")
+        return 0, None
+
+    return 0, {'devices': [device.to_dict() for device in devices]}
+
+
+def cmd_info(args, timer):
+    device = timer.step('query', DeviceManager().get_device_info, args.udid, True)
+    if not device:
+        return 1, {'udid': args.udid, 'error': 'Could not get device info'}
+    return 0, {'device': device.to_dict()}
+
+
+def cmd_mount(args, timer):
+    device_manager = DeviceManager()
+    # ifuse has to outlive this process
+    mount_manager = MountManager(supervise=False)
+
+    if args.all:
+        devices = timer.step('scan', device_manager.refresh_devices)
+    else:
+        devices = timer.step('query', device_manager.query_devices, args.udids)
+        found = {device.udid for device in devices}
+        missing = [udid for udid in args.udids if udid not in found]
+        if missing:
+            logger.warning("Devices not found: %s", ", ".join(missing))
+
+    results, summary = timer.step(
+        'mount', mount_manager.mount_all, devices, args.jobs, args.open
+    )
+    if not args.all:
+        results.extend(
+            {'udid': udid, 'success': False, 'error': 'Device not found'}
+            for udid in missing
+        )
+        summary['total'] += len(missing)
+        summary['failed'] += len(missing)
+
+    failed = any(not result['success'] for result in results)
+    return (1 if failed else 0), {'results': results, 'summary': summary}
+
+
+def cmd_unmount(args, timer):
+    mount_manager = MountManager()
+    mount_points = list(mount_manager.mount_table.reload())
+
+    # Mount point names end with the device UDID
+    if not args.all:
+        mount_points = [
+            mount_point for mount_point in mount_points
+            if any(Path(mount_point).name.endswith(f"_{udid}") for udid in args.udids)
+        ]
+
+    results, summary = timer.step(
+        'unmount', mount_manager.unmount_all, mount_points, args.jobs, None, args.wait
+    )
+
+    failed = any(not result['success'] for result in results)
+    return (1 if failed else 0), {'results': results, 'summary': summary}
+
+
+def cmd_cleanup(args, timer):
+    mount_manager = MountManager()
+    timer.step('cleanup', mount_manager.cleanup_stale_mounts)
+    return 0, {'success': True}
+
+
+def build_parser():
+    # Imported here, the GUI also imports this module but never parses
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog='pardus-idevice-mounter',
+        description='Mount iPhone/iPad devices without the graphical interface.'
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = subparsers.add_parser('list', help='list connected devices')
+    list_parser.add_argument('--json', action='store_true', help='print JSON')
+    list_parser.set_defaults(func=cmd_list)
+
+    info_parser = subparsers.add_parser('info', help='show device information')
+    info_parser.add_argument('udid')
+    info_parser.set_defaults(func=cmd_info, json=True)
+
+    for name, func, help_text in (
+        ('mount', cmd_mount, 'mount devices'),
+        ('unmount', cmd_unmount, 'unmount devices'),
+    ):
+        sub = subparsers.add_parser(name, help=help_text)
+        target = sub.add_mutually_exclusive_group(required=True)
+        target.add_argument('udids', nargs='*', default=[], metavar='UDID')
+        target.add_argument('--all', action='store_true', help='all devices')
+        sub.add_argument('--jobs', type=int, default=BATCH_JOBS,
+                         help='parallel jobs (default: %(default)s)')
+        sub.set_defaults(func=func, json=True)
+
+    mount_parser = subparsers.choices['mount']
+    mount_parser.add_argument('--open', action='store_true',
+                              help='open a file manager for each mounted device')
+
+    unmount_parser = subparsers.choices['unmount']
+    unmount_parser.add_argument('--wait', action='store_true',
+                                help='wait until files on busy devices are closed')
+
+    cleanup_parser = subparsers.add_parser('cleanup', help='remove stale mounts')
+    cleanup_parser.set_defaults(func=cmd_cleanup, json=True)
+
+    return parser
+
+
+def main(argv):
+    args = build_parser().parse_args(argv)
+    setup_logging()
+    timer = Timer()
+
+    start = time.monotonic()
+    status, data = args.func(args, timer)
+    timer.timings['total'] = round((time.monotonic() - start) * 1000, 1)
+
+    if METRICS_FILE:
+        metrics.write()
+
+    if args.json and data is not None:
+        data['command'] = args.command
+        data['timings_ms'] = timer.timings
+        _print_json(data)
+
+    return status
@@ -0,0 +1,380 @@
+#!/usr/bin/python3
+"""
+Shared runner for external commands.
+Every invocation is recorded as a timed span (command, UDID, duration,
+exit code, timeout) and aggregated into histograms that can be exported
+as JSON or in Prometheus text format.
+
+Commands run in their own process group. An operation made of several
+commands can share a Deadline (overall time budget) and a CancelToken,
+cancelling the token kills the process groups of its running commands.
+"""
+
+import json
+import os
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from logger_config import get_logger
+
+logger = get_logger('command_runner')
+
+# Histogram bucket upper bounds (seconds)
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30)
+
+# Recent spans kept for rolling statistics
+RECENT_SPANS = 2048
+ROLLING_WINDOW = 15 * 60
+
+# Metrics are written on demand (.prom for Prometheus, else JSON).
+# If PARDUS_IDEVICE_MOUNTER_METRICS is set they are also written on exit.
+METRICS_FILE = os.environ.get('PARDUS_IDEVICE_MOUNTER_METRICS')
+DEFAULT_METRICS_FILE = (
+    Path.home() / ".local" / "share" / "pardus-idevice-mounter" / "metrics.prom"
+)
+
+
+class Span:
+    """
+    One external command invocation.
+    """
+
+    __slots__ = ('command', 'label', 'udid', 'started', 'duration',
+                 'returncode', 'timeout', 'timed_out')
+
+    def __init__(self, command, label, udid, timeout):
+        self.command = command
+        self.label = label
+        self.udid = udid
+        self.timeout = timeout
+        self.started = time.time()
+        self.duration = None
+        self.returncode = None
+        self.timed_out = False
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Histogram:
+    """
+    Cumulative duration histogram of one (command, label, udid) series.
+    """
+
+    def __init__(self):
+        self.bucket_counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.timeouts = 0
+        self.failures = 0
+
+    def observe(self, span):
+        self.count += 1
+        self.total += span.duration
+        for index, bound in enumerate(BUCKETS):
+            if span.duration <= bound:
+                self.bucket_counts[index] += 1
+        if span.timed_out:
+            self.timeouts += 1
+        elif span.returncode != 0:
+            self.failures += 1
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, int(round(fraction * len(ordered))) - 1)]
+
+
+class CommandMetrics:
+    """
+    Thread safe store of spans and per series histograms.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.recent = deque(maxlen=RECENT_SPANS)
+
+    def record(self, span):
+        key = (span.command[0], span.label or '', span.udid or '')
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(span)
+            self.recent.append(span)
+
+    def rolling_stats(self, window=ROLLING_WINDOW):
+        """
+        Latency percentiles and timeout headroom of recent spans.
+        """
+        since = time.time() - window
+        series = {}
+        with self.lock:
+            spans = [span for span in self.recent if span.started >= since]
+        for span in spans:
+            key = (span.command[0], span.label or '', span.udid or '')
+            series.setdefault(key, []).append(span)
+
+        stats = []
+        for (command, label, udid), items in sorted(series.items()):
+            durations = [span.duration for span in items]
+            # Closest call to its timeout, 1.0 means it timed out
+            budget_used = max(
+                (span.duration / span.timeout for span in items if span.timeout),
+                default=None
+            )
+            stats.append({
+                'command': command,
+                'label': label,
+                'udid': udid,
+                'count': len(items),
+                'p50': _percentile(durations, 0.50),
+                'p95': _percentile(durations, 0.95),
+                'max': max(durations),
+                'timeouts': sum(1 for span in items if span.timed_out),
+                'max_timeout_fraction': budget_used,
+            })
+        return stats
+
+    def to_json(self):
+        with self.lock:
+            recent = [span.to_dict() for span in self.recent]
+        return json.dumps({
+            'rolling': self.rolling_stats(),
+            'recent_spans': recent,
+        }, indent=2)
+
+    def to_prometheus(self):
+        lines = [
+            '# HELP idevice_mounter_command_duration_seconds External command duration',
+            '# TYPE idevice_mounter_command_duration_seconds histogram',
+        ]
+        counters = []
+        with self.lock:
+            items = sorted(self.histograms.items())
+            for (command, label, udid), histogram in items:
+                labels = f'command="{command}",label="{label}",udid="{udid}"'
+                for bound, count in zip(BUCKETS, histogram.bucket_counts):
+                    lines.append(
+                        f'idevice_mounter_command_duration_seconds_bucket'
+                        f'{{{labels},le="{bound}"}} {count}'
+                    )
+                lines.append(
+                    f'idevice_mounter_command_duration_seconds_bucket'
+                    f'{{{labels},le="+Inf"}} {histogram.count}'
+                )
+                lines.append(
+                    f'idevice_mounter_command_duration_seconds_sum{{{labels}}} {histogram.total}'
+                )
+                lines.append(
+                    f'idevice_mounter_command_duration_seconds_count{{{labels}}} {histogram.count}'
+                )
+                counters.append((labels, histogram))
+
+        lines.append('# HELP idevice_mounter_command_timeouts_total Commands killed by timeout')
+        lines.append('# TYPE idevice_mounter_command_timeouts_total counter')
+        for labels, histogram in counters:
+            lines.append(f'idevice_mounter_command_timeouts_total{{{labels}}} {histogram.timeouts}')
+
+        lines.append('# HELP idevice_mounter_command_failures_total Commands with non-zero exit')
+        lines.append('# TYPE idevice_mounter_command_failures_total counter')
+        for labels, histogram in counters:
+            lines.append(f'idevice_mounter_command_failures_total{{{labels}}} {histogram.failures}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path=None):
+        """
+        Write metrics atomically, format is picked by file extension.
+        Returns True on success.
+        """
+        path = Path(path or METRICS_FILE or DEFAULT_METRICS_FILE)
+        content = self.to_prometheus() if path.suffix == '.prom' else self.to_json()
+        tmp_path = path.with_name(path.name + '.tmp')
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(content, encoding='utf-8')
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not write metrics to %s: %s", path, e)
+            return False
+
+        logger.info("Command metrics written to %s", path)
+        return True
+
+
+metrics = CommandMetrics()
+
+
+class Cancelled(Exception):
+    """
+    Raised by run_command when its CancelToken was cancelled.
+    """
+
+
+class CancelToken:
+    """
+    Cancellation flag shared by the commands of one operation.
+    A child token is cancelled together with its parent.
+    """
+
+    def __init__(self, parent=None):
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.callbacks = []
+        self.unregister = None
+        if parent:
+            self.unregister = parent.on_cancel(self.cancel)
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+    def cancel(self):
+        with self.lock:
+            if self.event.is_set():
+                return
+            self.event.set()
+            callbacks, self.callbacks = self.callbacks, []
+        if self.unregister:
+            # Cancelled children are no longer kept by the parent
+            self.unregister()
+        for callback in callbacks:
+            callback()
+
+    def check(self):
+        if self.event.is_set():
+            raise Cancelled()
+
+    def wait(self, timeout=None):
+        """
+        Returns True if cancelled within timeout.
+        """
+        return self.event.wait(timeout)
+
+    def on_cancel(self, callback):
+        """
+        Calls callback on cancel, right away if already cancelled.
+        Returns a function that unregisters it.
+        """
+        with self.lock:
+            if not self.event.is_set():
+                self.callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def _remove(self, callback):
+        with self.lock:
+            try:
+                self.callbacks.remove(callback)
+            except ValueError:
+                pass
+
+
+class Deadline:
+    """
+    Overall time budget of an operation made of several commands.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires - time.monotonic())
+
+    @property
+    def expired(self):
+        return time.monotonic() >= self.expires
+
+    def timeout(self, limit):
+        """
+        Timeout for the next step, limit clipped to the remaining budget.
+        """
+        return min(limit, self.remaining())
+
+
+def kill_group(process, signum=signal.SIGKILL):
+    """
+    Signals the process group led by process (start_new_session=True).
+    """
+    try:
+        os.killpg(process.pid, signum)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+@contextmanager
+def track(command, timeout, udid=None, label=None):
+    """
+    Records a span around a command the caller runs itself (e.g. Popen).
+    The caller sets span.returncode / span.timed_out.
+    """
+    span = Span(command, label, udid, timeout)
+    start = time.monotonic()
+    try:
+        yield span
+    finally:
+        finish_span(span, time.monotonic() - start)
+
+
+def finish_span(span, duration):
+    """
+    Records a finished span, for callers that can not use track().
+    """
+    span.duration = duration
+    metrics.record(span)
+    logger.debug(
+        "%s took %.3fs (exit %s%s)",
+        ' '.join(span.command), span.duration, span.returncode,
+        ', timed out' if span.timed_out else ''
+    )
+
+
+def run_command(command, timeout, udid=None, label=None, token=None,
+                deadline=None, capture_output=False, **kwargs):
+    """
+    subprocess.run replacement that records a span for the call.
+    The command runs in its own process group, the whole group is killed
+    on timeout or when token is cancelled. The timeout is clipped to the
+    remaining deadline budget.
+    Raises the same exceptions as subprocess.run, and Cancelled.
+    """
+    if token:
+        token.check()
+    if deadline:
+        timeout = deadline.timeout(timeout)
+        if timeout <= 0:
+            raise subprocess.TimeoutExpired(command, 0)
+
+    if capture_output:
+        kwargs['stdout'] = kwargs['stderr'] = subprocess.PIPE
+
+    with track(command, timeout, udid, label) as span:
+        process = subprocess.Popen(command, start_new_session=True, **kwargs)
+        unregister = token.on_cancel(lambda: kill_group(process)) if token else None
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            span.timed_out = True
+            kill_group(process)
+            process.communicate()
+            raise
+        except BaseException:
+            kill_group(process)
+            process.wait()
+            raise
+        finally:
+            if unregister:
+                unregister()
+
+        span.returncode = process.returncode
+        if token and token.cancelled:
+            raise Cancelled()
+        return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
@@ -0,0 +1,163 @@
+#!/usr/bin/python3
+"""
+Model backed device list.
+Every listed device is a DeviceItem in a Gio.ListStore, the list box
+builds a row per item from the device_row_template of the glade file.
+Rows follow their item through its "changed" signal.
+"""
+
+from locale import gettext as _
+from xml.etree import ElementTree
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import GObject, Gtk
+
+ROW_TEMPLATE_ID = "device_row_template"
+
+DOT_MARKUP = {
+    "unverified": '<span foreground="gray">●</span>',
+    "trusted": '<span foreground="green">●</span>',
+    "untrusted": '<span foreground="red">●</span>',
+}
+
+
+class DeviceItem(GObject.Object):
+    """
+    State of one listed device.
+    Call changed() after modifying it to update its row.
+    """
+
+    __gsignals__ = {
+        "changed": (GObject.SignalFlags.RUN_FIRST, None, ()),
+    }
+
+    def __init__(self, device, verified=True):
+        super().__init__()
+        self.device = device
+        self.is_verified = verified
+        self.is_mounted = False
+        self.mount_point = None
+        self.is_busy = False
+        # Button text while busy ("Mounting…", "Flushing…")
+        self.busy_label = None
+
+    @property
+    def is_actionable(self):
+        """
+        Untrusted devices can not be mounted, a mounted one can still
+        be unmounted if the trust was revoked meanwhile.
+        """
+        return bool(self.is_verified and not self.is_busy and
+                    (self.device.is_trusted or self.is_mounted))
+
+    def changed(self):
+        self.emit("changed")
+
+
+def load_row_template(glade_file):
+    """
+    Returns the row template of the glade file as builder XML.
+    """
+    root = ElementTree.parse(glade_file).getroot()
+    for element in root.iter("object"):
+        if element.get("id") == ROW_TEMPLATE_ID:
+            interface = ElementTree.Element("interface")
+            interface.append(element)
+            return ElementTree.tostring(interface, encoding="unicode")
+    raise ValueError(f"{ROW_TEMPLATE_ID} not found in {glade_file}")
+
+
+class DeviceRowFactory:
+    """
+    Creates rows for Gtk.ListBox.bind_model and keeps them up to date.
+    on_primary_clicked(item) and on_details_clicked(item) are called
+    from the row buttons.
+    """
+
+    def __init__(self, glade_file, on_primary_clicked, on_details_clicked):
+        self.glade_file = glade_file
+        self.on_primary_clicked = on_primary_clicked
+        self.on_details_clicked = on_details_clicked
+        # Read on first use
+        self.template = None
+
+    def create_row(self, item):
+        if self.template is None:
+            self.template = load_row_template(self.glade_file)
+
+        builder = Gtk.Builder()
+        builder.add_from_string(self.template)
+
+        row = builder.get_object(ROW_TEMPLATE_ID)
+        row.dot_label = builder.get_object("row_dot")
+        row.title_label = builder.get_object("row_title")
+        row.details_label = builder.get_object("row_details")
+        row.status_label = builder.get_object("row_status")
+        row.primary_button = builder.get_object("row_primary_button")
+        row.dot_state = None
+
+        row.primary_button.connect(
+            "clicked", lambda button: self.on_primary_clicked(item))
+        builder.get_object("row_details_button").connect(
+            "clicked", lambda button: self.on_details_clicked(item))
+
+        handler_id = item.connect("changed", self.update_row, row)
+        row.connect("destroy", lambda widget: item.disconnect(handler_id))
+
+        self.update_row(item, row)
+        row.show_all()
+        return row
+
+    def update_row(self, item, row):
+        """
+        Patches row widgets in place, only those whose content changed
+        are touched.
+        """
+        device = item.device
+
+        if not item.is_verified:
+            dot_state = "unverified"
+        elif device.is_trusted:
+            dot_state = "trusted"
+        else:
+            dot_state = "untrusted"
+        if row.dot_state != dot_state:
+            row.dot_state = dot_state
+            row.dot_label.set_markup(DOT_MARKUP[dot_state])
+
+        device_name = device.name or device.model or f'{_("Device")}_{device.udid}'
+        _set_text(row.title_label, device_name)
+
+        storage_text = f"{device.storage_total:.0f}GB" if device.storage_total else _("Unknown")
+        ios_text = device.ios_version or _("Unknown")
+        _set_text(row.details_label, f"{storage_text} · iOS {ios_text}")
+
+        udid_short = device.udid[:8] + "..." if len(device.udid) > 8 else device.udid
+        if not item.is_verified:
+            status_text = f'{_("Checking…")} · UDID: {udid_short}'
+        elif device.is_trusted:
+            status_text = f'{_("Trusted")} · UDID: {udid_short}'
+        else:
+            status_text = _("Not Trusted · Unlock the device and tap \"Trust\"")
+        _set_text(row.status_label, status_text)
+
+        if item.is_busy and item.busy_label:
+            button_text = item.busy_label
+        elif item.is_mounted:
+            button_text = _("Unmount")
+        else:
+            button_text = _("Mount")
+        if row.primary_button.get_label() != button_text:
+            row.primary_button.set_label(button_text)
+
+        sensitive = item.is_actionable
+        if row.primary_button.get_sensitive() != sensitive:
+            row.primary_button.set_sensitive(sensitive)
+
+
+def _set_text(label, text):
+    """
+    Sets label text only if it changed, avoiding a relayout.
+    """
+    if label.get_text() != text:
+        label.set_text(text)
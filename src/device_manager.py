@@ -3,11 +3,70 @@
 Device Manager for iPhone/iPad detection.
 """
 
+import errno
+import os
+import plistlib
 import subprocess
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from xml.parsers.expat import ExpatError
+from command_runner import CancelToken, Cancelled, Deadline, run_command
 from logger_config import get_logger
+import usbmux
 
 logger = get_logger('device_manager')
 
+# Upper bound for parallel ideviceinfo processes
+MAX_WORKERS = 8
+
+DISK_USAGE_DOMAIN = 'com.apple.disk_usage'
+BATTERY_DOMAIN = 'com.apple.mobile.battery'
+
+# Single key queries, the version validates cached base values, the
+# name can change any time (renamed in Settings) and the capacity is the
+# only disk_usage value shown in the list
+VERSION_QUERY = 'ProductVersion'
+NAME_QUERY = 'DeviceName'
+CAPACITY_QUERY = 'TotalDiskCapacity'
+
+# Queries of a scan, None is the base (no domain) query
+SCAN_QUERIES = (None, CAPACITY_QUERY)
+
+# Pairing check of a new device and the public values query used for
+# untrusted devices (no pairing needed)
+TRUST_QUERY = 'trust'
+PUBLIC_QUERY = 'public'
+
+# Domains only shown in the details dialog, fetched on demand
+EXTENDED_DOMAINS = (DISK_USAGE_DOMAIN, BATTERY_DOMAIN)
+
+# Domains whose values change while the device is connected
+VOLATILE_DOMAINS = (DISK_USAGE_DOMAIN, BATTERY_DOMAIN)
+
+# Lifetime of cached volatile domains (seconds)
+VOLATILE_TTL = 60
+
+# "subprocess" runs libimobiledevice tools, "usbmux" talks to usbmuxd directly
+BACKEND = os.environ.get('PARDUS_IDEVICE_MOUNTER_BACKEND', 'subprocess')
+
+# Host pairing records written by usbmuxd
+LOCKDOWN_DIR = '/var/lib/lockdown'
+
+# idevicepair validate and public value queries of untrusted devices (seconds)
+TRUST_TIMEOUT = 3
+
+# Overall time budget of a scan, grows with the number of devices (seconds)
+SCAN_DEADLINE = float(os.environ.get('PARDUS_IDEVICE_MOUNTER_SCAN_DEADLINE', 20))
+SCAN_DEADLINE_PER_DEVICE = float(
+    os.environ.get('PARDUS_IDEVICE_MOUNTER_SCAN_DEADLINE_PER_DEVICE', 2)
+)
+
+
+def scan_deadline(device_count):
+    return Deadline(SCAN_DEADLINE + SCAN_DEADLINE_PER_DEVICE * device_count)
+
 
 def get_friendly_model_name(product_type):
     """
@@ -46,6 +105,62 @@ def get_friendly_model_name(product_type):
     return models.get(product_type, product_type)
 
 
+def parse_plist_output(data):
+    """
+    Decode `ideviceinfo -x` output into a dict of typed values.
+    Single key queries (-k) return the bare value.
+    """
+    return plistlib.loads(data, fmt=plistlib.FMT_XML)
+
+
+def apply_disk_usage(device, disk_data):
+    """
+    Set storage fields from libimobiledevice's disk_usage domain.
+    """
+    # Total capacity
+    total_bytes = disk_data.get('TotalDiskCapacity')
+    if isinstance(total_bytes, int):
+        device.storage_total = total_bytes / (1000**3)
+
+    # Available storage
+    available_bytes = disk_data.get('TotalDataAvailable')
+    if isinstance(available_bytes, int):
+        device.storage_available = available_bytes / (1000**3)
+
+    # Calculate used storage
+    # NOTE: This may show less than iPhone because iPhone
+    # includes system data, cache, and reserved space
+    if device.storage_total and device.storage_available:
+        device.storage_used = device.storage_total - device.storage_available
+
+
+def apply_battery(device, battery_data):
+    """
+    Set battery fields from the battery domain.
+    """
+    # Get battery level
+    battery_level = battery_data.get('BatteryCurrentCapacity')
+    if isinstance(battery_level, int):
+        device.battery_level = battery_level
+
+    # Get battery state
+    is_charging = battery_data.get('BatteryIsCharging')
+    if is_charging is True:
+        device.battery_state = "Charging"
+    elif is_charging is False:
+        device.battery_state = "Discharging"
+
+
+def apply_domain(device, domain, data):
+    """
+    Set the fields of an extended domain on a device.
+    """
+    if domain == DISK_USAGE_DOMAIN:
+        apply_disk_usage(device, data)
+    elif domain == BATTERY_DOMAIN:
+        apply_battery(device, data)
+
+
 class Device:
 
     def __init__(self, udid):
@@ -66,210 +181,796 @@ class Device:
         self.wifi_mac = None            # WiFi MAC address
         self.bluetooth_mac = None       # Bluetooth MAC address
 
+    def to_dict(self):
+        # Unset fields are left out to keep snapshots compact
+        return {key: value for key, value in vars(self).items() if value is not None}
+
+    @classmethod
+    def from_dict(cls, data):
+        device = cls(data['udid'])
+        for key in vars(device):
+            if key in data:
+                setattr(device, key, data[key])
+        return device
+
+
+class DeviceInfoCache:
+    """
+    Per-UDID cache of info domain results.
+    Base values are kept for the session, volatile domains expire after
+    ttl seconds. Entries are dropped on detach or iOS version change.
+    """
+
+    def __init__(self, ttl=VOLATILE_TTL):
+        self.ttl = ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, udid, domain):
+        """
+        Return cached domain data or None if missing or expired.
+        """
+        with self.lock:
+            cached = self.entries.get(udid, {}).get(domain)
+        if cached is None:
+            return None
+
+        stored_at, data = cached
+        if domain in VOLATILE_DOMAINS and time.monotonic() - stored_at > self.ttl:
+            return None
+        return data
+
+    def put(self, udid, domain, data):
+        with self.lock:
+            self.entries.setdefault(udid, {})[domain] = (time.monotonic(), data)
+
+    def ios_version(self, udid):
+        base = self.get(udid, None)
+        return base.get('ProductVersion') if base else None
+
+    def invalidate(self, udid):
+        with self.lock:
+            self.entries.pop(udid, None)
+
+
+class ScanState:
+    """
+    Query bookkeeping of one scan, independent of how the queries run.
+    start() returns the first (udid, query) pairs, every answer is passed
+    to result() which returns the follow-up queries and the Device once
+    all queries of that device have answered.
+    """
+
+    def __init__(self, manager, udids):
+        self.manager = manager
+        self.udids = udids
+        self.expected = {udid: set() for udid in udids}
+        self.results = {udid: {} for udid in udids}
+        self.finished = {}
+        self.deadline = scan_deadline(len(udids))
+
+    def _want(self, udid, query):
+        self.expected[udid].add(query)
+        return udid, query
+
+    def start(self):
+        return [
+            self._want(udid, query)
+            for udid in self.udids
+            for query in self.manager._initial_queries(udid)
+        ]
+
+    def result(self, udid, query, value):
+        """
+        Returns (follow-up queries, Device or None).
+        """
+        results = self.results[udid]
+        results[query] = value
+        follow_up = []
+
+        if query == TRUST_QUERY:
+            if value is False:
+                # Skip queries that need pairing, they fail or hang
+                logger.info("Device %s is not trusted", udid)
+                follow_up.append(self._want(udid, PUBLIC_QUERY))
+            else:
+                for scan_query in SCAN_QUERIES:
+                    follow_up.append(self._want(udid, scan_query))
+
+        elif query is None and value is None and \
+                PUBLIC_QUERY not in self.expected[udid]:
+            # Pair record exists but the device may have revoked it
+            follow_up.append(self._want(udid, PUBLIC_QUERY))
+
+        elif query == VERSION_QUERY:
+            if value is not None and value != self.manager.cache.ios_version(udid):
+                # iOS was updated, static values may have changed too
+                logger.info("iOS version of %s changed to %s", udid, value)
+                self.manager.cache.invalidate(udid)
+                for scan_query in SCAN_QUERIES:
+                    if scan_query not in self.expected[udid]:
+                        follow_up.append(self._want(udid, scan_query))
+
+        # Wait until every query of this device has answered
+        if not self.expected[udid] <= results.keys():
+            return follow_up, None
+
+        device = self.manager._finish_device(udid, results)
+        self.finished[udid] = device
+        if device is None:
+            logger.warning("Could not get info for %s", udid)
+        return follow_up, device
+
+    def give_up(self, reason=None):
+        """
+        Logs the devices that have not answered.
+        """
+        unfinished = [udid for udid in self.udids if udid not in self.finished]
+        logger.warning(
+            "Scan %s, no answer from: %s",
+            reason or f"deadline of {self.deadline.seconds:.0f}s expired",
+            ", ".join(unfinished)
+        )
+
+    def devices(self):
+        """
+        Devices that answered, in the given order.
+        """
+        return [
+            self.finished[udid] for udid in self.udids
+            if self.finished.get(udid) is not None
+        ]
+
 
 class DeviceManager:
     """
     Manages iOS device detection and information.
     """
 
-    def __init__(self):
-        pass
+    def __init__(self, max_workers=MAX_WORKERS, backend=BACKEND):
+        # Shared bounded pool for ideviceinfo queries
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='device-query'
+        )
+
+        self.cache = DeviceInfoCache()
+
+        self.use_usbmux = backend == 'usbmux'
+        if self.use_usbmux:
+            logger.info("Using native usbmuxd backend")
+
+        # usbmuxd device ids and reused lockdown connections, keyed by UDID
+        self.usbmux_ids = {}
+        self.lockdown_clients = {}
+        self.lockdown_lock = threading.Lock()
+
+        # Cancelled on close(), per device children on forget()
+        self.token = CancelToken()
+        self.device_tokens = {}
+        self.token_lock = threading.Lock()
+
+    def close(self):
+        """
+        Kill running commands and close reused lockdown connections.
+        """
+        self.token.cancel()
+        with self.lockdown_lock:
+            clients = list(self.lockdown_clients.values())
+            self.lockdown_clients.clear()
+        for client in clients:
+            client.close()
+
+    def forget(self, udid):
+        """
+        Drop everything known about a detached device.
+        """
+        self.cache.invalidate(udid)
+        self.usbmux_ids.pop(udid, None)
+        with self.lockdown_lock:
+            client = self.lockdown_clients.pop(udid, None)
+        with self.token_lock:
+            token = self.device_tokens.pop(udid, None)
+        if client:
+            client.close()
+        if token:
+            # Kills queries still waiting for the device
+            token.cancel()
+
+    def _device_token(self, udid):
+        """
+        Cancel token of the commands run for a device.
+        """
+        with self.token_lock:
+            token = self.device_tokens.get(udid)
+            if token is None:
+                token = self.device_tokens[udid] = CancelToken(self.token)
+            return token
 
     def get_connected_devices(self):
         """
         Get list of connected device UDIDs.
         Returns list of UDID strings.
         """
-        try:
-            # List connected devices
-            logger.info("Running idevice_id -l to detect devices")
-            result = subprocess.run(
-                ['idevice_id', '-l'],
-                capture_output=True,
-                text=True,
-                timeout=5,
-                check=False
-            )
-
-            if result.returncode != 0:
-                logger.warning(
-                    "idevice_id failed with code %d: %s",
-                    result.returncode, result.stderr
-                )
-                return []
-
-            # Parse ourput | each line is a UDID
-            output_lines = result.stdout.split('\n')
-            udids = [line.strip() for line in output_lines if line.strip()]
-
-            logger.info("Found %d connected device(s)", len(udids))
-            for udid in udids:
-                logger.debug("  - UDID: %s", udid)
+        if self.use_usbmux:
+            udids = self._list_usbmux_devices()
+            if udids is not None:
+                return udids
 
-            return udids
+        logger.info("Running idevice_id -l to detect devices")
+        try:
+            return self._run_parsed(*self.device_list_command())
+        except Cancelled:
+            logger.info("Device detection cancelled")
+            return []
 
-        except FileNotFoundError:
+    def device_list_command(self):
+        """
+        idevice_id invocation (run_command arguments) and its parser,
+        for callers that run the command themselves.
+        parse(result, error) returns the UDID list.
+        """
+        command = {
+            'command': ['idevice_id', '-l'],
+            'timeout': 5,
+            'token': self.token,
+            'text': True,
+        }
+        return command, self._parse_device_list
+
+    def _parse_device_list(self, result, error):
+        if isinstance(error, FileNotFoundError):
             logger.error(
                 "idevice_id not found. "
                 "Please install libimobiledevice-utils"
             )
             return []
-        except subprocess.TimeoutExpired:
+        if isinstance(error, subprocess.TimeoutExpired):
             logger.error("idevice_id command timed out")
             return []
-        except Exception as e:
-            logger.error("Error getting connected devices: %s", e)
+        if error:
+            logger.error("Error getting connected devices: %s", error)
             return []
 
-    def get_device_info(self, udid):
+        if result.returncode != 0:
+            logger.warning(
+                "idevice_id failed with code %d: %s",
+                result.returncode, result.stderr
+            )
+            return []
+
+        # Parse ourput | each line is a UDID
+        output_lines = result.stdout.split('\n')
+        udids = [line.strip() for line in output_lines if line.strip()]
+
+        logger.info("Found %d connected device(s)", len(udids))
+        for udid in udids:
+            logger.debug("  - UDID: %s", udid)
+
+        return udids
+
+    def _run_parsed(self, command, parse, deadline=None):
         """
-        Get device information for given UDID.
-        Returns device object with name, model & iOS version.
+        Runs a command returned by one of the *_command() methods.
+        Returns its parsed value, raises Cancelled.
         """
         try:
-            # Run ideviceinfo for specific device with udid
-            logger.info("Getting device info for UDID: %s", udid)
-            result = subprocess.run(
-                ['ideviceinfo', '-u', udid],
-                capture_output=True,
-                text=True,
-                timeout=10,
-                check=False
+            result = run_command(deadline=deadline, capture_output=True, **command)
+        except (subprocess.SubprocessError, OSError) as e:
+            return parse(None, e)
+        return parse(result, None)
+
+    def _list_usbmux_devices(self):
+        """
+        List USB devices through usbmuxd.
+        Returns None if usbmuxd could not be reached.
+        """
+        try:
+            with usbmux.UsbmuxClient() as client:
+                entries = client.list_devices()
+        except (usbmux.UsbmuxError, OSError) as e:
+            logger.warning("usbmuxd device list failed, using idevice_id: %s", e)
+            return None
+
+        # idevice_id -l only lists USB devices too
+        entries = [
+            entry for entry in entries
+            if entry['udid'] and entry['connection_type'] == 'USB'
+        ]
+        self.usbmux_ids = {entry['udid']: entry['device_id'] for entry in entries}
+
+        udids = list(self.usbmux_ids)
+        logger.info("Found %d connected device(s)", len(udids))
+
+        # Drop connections of devices that are gone
+        with self.lockdown_lock:
+            gone = [udid for udid in self.lockdown_clients if udid not in self.usbmux_ids]
+            clients = [self.lockdown_clients.pop(udid) for udid in gone]
+        for client in clients:
+            client.close()
+
+        return udids
+
+    def _get_lockdown_client(self, udid):
+        """
+        Return the reused lockdown connection of a device.
+        Connects without holding the lock, the setup takes several round
+        trips (and TLS) that other devices must not wait for.
+        """
+        with self.lockdown_lock:
+            client = self.lockdown_clients.get(udid)
+        if client:
+            return client
+
+        device_id = self.usbmux_ids.get(udid)
+        if device_id is None:
+            raise usbmux.UsbmuxError(f"Unknown usbmuxd device {udid}")
+
+        client = usbmux.LockdownClient(udid, device_id)
+        with self.lockdown_lock:
+            current = self.lockdown_clients.get(udid)
+            if current is None and not self.token.cancelled and \
+                    self.usbmux_ids.get(udid) == device_id:
+                self.lockdown_clients[udid] = client
+                return client
+
+        # Another thread connected first, or the device was forgotten
+        client.close()
+        if current is None:
+            raise usbmux.UsbmuxError(f"Device {udid} went away while connecting")
+        return current
+
+    def _query_lockdown(self, udid, domain=None, key=None):
+        """
+        Read a lockdown domain or key over the reused connection.
+        Returns dict (value for key queries) or None if the connection failed.
+        """
+        client = None
+        try:
+            client = self._get_lockdown_client(udid)
+            value = client.get_value(domain, key)
+        except (usbmux.UsbmuxError, OSError) as e:
+            logger.warning(
+                "lockdown query %s failed for %s: %s",
+                domain or "base", udid, e
             )
+            if client:
+                with self.lockdown_lock:
+                    # Keep a connection another thread made meanwhile
+                    if self.lockdown_clients.get(udid) is client:
+                        del self.lockdown_clients[udid]
+                client.close()
+            return None
 
-            if result.returncode != 0:
-                logger.warning("ideviceinfo failed for %s", udid)
-                return None
+        if key:
+            return value
+        return value if isinstance(value, dict) else None
 
-            # Parse output | key: value
-            device_data = {}
-            for line in result.stdout.split('\n'):
-                if ':' in line:
-                    key, value = line.split(':', 1)
-                    device_data[key.strip()] = value.strip()
-
-            # Create device object
-            device = Device(udid)
-            device.name = device_data.get('DeviceName', None)
-            device.model = device_data.get('ProductType', None)
-            device.friendly_model = get_friendly_model_name(device.model)
-            device.ios_version = device_data.get('ProductVersion', None)
-            device.build_version = device_data.get('BuildVersion', None)
-            device.serial_number = device_data.get('SerialNumber', None)
-            device.hardware_model = device_data.get('HardwareModel', None)
-            device.wifi_mac = device_data.get('WiFiAddress', None)
-            device.bluetooth_mac = device_data.get('BluetoothAddress', None)
-
-            # These values are based on libimobiledevice's disk_usage domain
-            try:
-                disk_result = subprocess.run(
-                    [
-                        'ideviceinfo', '-u', udid,
-                        '-q', 'com.apple.disk_usage'
-                    ],
-                    capture_output=True,
-                    text=True,
-                    timeout=5,
-                    check=False
-                )
-                if disk_result.returncode == 0:
-                    # Parse disk usage data
-                    disk_data = {}
-                    for line in disk_result.stdout.split('\n'):
-                        if ':' in line:
-                            key, value = line.split(':', 1)
-                            disk_data[key.strip()] = value.strip()
-
-                    # Total capacity
-                    total_capacity = disk_data.get('TotalDiskCapacity')
-                    if total_capacity:
-                        try:
-                            total_bytes = int(total_capacity)
-                            device.storage_total = total_bytes / (1000**3)
-                        except ValueError:
-                            pass
-                    # Available storage
-                    available_capacity = disk_data.get('TotalDataAvailable')
-                    if available_capacity:
-                        try:
-                            available_bytes = int(available_capacity)
-                            device.storage_available = available_bytes / (1000**3)
-                        except ValueError:
-                            pass
-
-                    # Calculate used storage
-                    # NOTE: This may show less than iPhone because iPhone
-                    # includes system data, cache, and reserved space
-                    if device.storage_total and device.storage_available:
-                        device.storage_used = device.storage_total - device.storage_available
-
-            except (subprocess.SubprocessError, OSError) as e:
-                logger.warning("Could not get disk usage info: %s", e)
-
-            # Get battery info
+    def _query_info(self, udid, domain=None, key=None, deadline=None):
+        """
+        Query one info domain (or single key) with the configured backend.
+        The native backend falls back to ideviceinfo on errors.
+        """
+        if self.use_usbmux and udid in self.usbmux_ids:
+            data = self._query_lockdown(udid, domain, key)
+            if data is not None:
+                return data
+        return self._run_ideviceinfo(udid, domain, key, deadline)
+
+    def check_trust(self, udid, deadline=None):
+        """
+        Check whether this host is paired with the device.
+        Pair records are looked up through usbmuxd or in LOCKDOWN_DIR,
+        idevicepair validate is only run if neither can be read.
+        Returns True, False or None if the status could not be determined.
+        """
+        if usbmux.is_available():
             try:
-                battery_result = subprocess.run(
-                    [
-                        'ideviceinfo', '-u', udid,
-                        '-q', 'com.apple.mobile.battery'
-                    ],
-                    capture_output=True,
-                    text=True,
-                    timeout=5,
-                    check=False
-                )
-                if battery_result.returncode == 0:
-                    # Parse battery data
-                    battery_data = {}
-                    for line in battery_result.stdout.split('\n'):
-                        if ':' in line:
-                            key, value = line.split(':', 1)
-                            battery_data[key.strip()] = value.strip()
-
-                    # Get battery level
-                    battery_capacity = battery_data.get('BatteryCurrentCapacity')
-                    if battery_capacity:
-                        try:
-                            device.battery_level = int(battery_capacity)
-                        except ValueError:
-                            pass
-
-                    # Get battery state
-                    is_charging = battery_data.get('BatteryIsCharging')
-                    if is_charging:
-                        if is_charging.lower() == "true":
-                            device.battery_state = "Charging"
-                        elif is_charging.lower() == "false":
-                            device.battery_state = "Discharging"
-
-            except (subprocess.SubprocessError, OSError) as e:
-                logger.warning("Could not get battery info: %s", e)
-
-            # Check trust status, if device info = 0, device is trusted
-            device.is_trusted = True
-
-            total_gb = device.storage_total if device.storage_total else 0
-
-            # Log device info
-            logger.info(
-                "Device: %s (%s, iOS %s, %.0fGB total, Trusted: %s)",
-                device.name or "Unknown",
-                device.model or "Unknown",
-                device.ios_version or "Unknown",
-                total_gb,
-                device.is_trusted
-            )
+                with usbmux.UsbmuxClient(timeout=TRUST_TIMEOUT) as client:
+                    return client.read_pair_record(udid) is not None
+            except (usbmux.UsbmuxError, OSError, plistlib.InvalidFileException) as e:
+                logger.debug("usbmuxd pair record lookup failed for %s: %s", udid, e)
 
-            return device
+        # A missing record only counts if the directory itself is there
+        try:
+            os.stat(os.path.join(LOCKDOWN_DIR, f"{udid}.plist"))
+            return True
+        except OSError as e:
+            if e.errno == errno.ENOENT and os.path.isdir(LOCKDOWN_DIR):
+                return False
 
+        try:
+            result = run_command(
+                ['idevicepair', '-u', udid, 'validate'],
+                timeout=TRUST_TIMEOUT,
+                udid=udid,
+                label='validate',
+                token=self._device_token(udid),
+                deadline=deadline,
+                capture_output=True,
+                text=True
+            )
         except FileNotFoundError:
+            logger.debug("idevicepair not found, trust status unknown")
+            return None
+        except (subprocess.SubprocessError, OSError) as e:
+            logger.warning("idevicepair validate failed for %s: %s", udid, e)
+            return None
+        return result.returncode == 0
+
+    def _query_public(self, udid, deadline=None):
+        """
+        Read the values a device exposes without pairing.
+        Returns dict or None on failure.
+        """
+        if self.use_usbmux and udid in self.usbmux_ids:
+            # Short lived, a session-less client must not be reused once paired
+            try:
+                client = usbmux.LockdownClient(
+                    udid, self.usbmux_ids[udid], timeout=TRUST_TIMEOUT)
+                try:
+                    value = client.get_value()
+                finally:
+                    client.close()
+                if isinstance(value, dict):
+                    return value
+            except (usbmux.UsbmuxError, OSError) as e:
+                logger.warning("lockdown public query failed for %s: %s", udid, e)
+
+        return self._run_parsed(*self._public_command(udid), deadline)
+
+    def _public_command(self, udid):
+        command = {
+            'command': ['ideviceinfo', '-u', udid, '-s', '-x'],
+            'timeout': TRUST_TIMEOUT,
+            'udid': udid,
+            'label': PUBLIC_QUERY,
+            'token': self._device_token(udid),
+        }
+        return command, partial(self._parse_public, udid)
+
+    def _parse_public(self, udid, result, error):
+        if error:
+            logger.warning("ideviceinfo public query failed for %s: %s", udid, error)
+            return None
+
+        if result.returncode != 0:
+            return None
+        try:
+            value = parse_plist_output(result.stdout)
+        except (plistlib.InvalidFileException, ExpatError, ValueError):
+            return None
+        return value if isinstance(value, dict) else None
+
+    def read_domain_live(self, udid, domain):
+        """
+        Read a domain for repeated sampling over the persistent lockdown
+        connection, resolving the usbmuxd device id if needed.
+        Falls back to ideviceinfo if usbmuxd can not be used.
+        Returns dict or None on failure, fresh values are cached.
+        """
+        data = None
+        if usbmux.is_available():
+            if udid not in self.usbmux_ids:
+                self._list_usbmux_devices()
+            if udid in self.usbmux_ids:
+                data = self._query_lockdown(udid, domain)
+
+        if data is None:
+            data = self._run_ideviceinfo(udid, domain)
+        if data is not None:
+            self.cache.put(udid, domain, data)
+        return data
+
+    def _run_query(self, udid, query, deadline=None):
+        """
+        Run one query, a domain or one of the single key queries.
+        """
+        if query == TRUST_QUERY:
+            return self.check_trust(udid, deadline)
+        if query == PUBLIC_QUERY:
+            return self._query_public(udid, deadline)
+        if query in (VERSION_QUERY, NAME_QUERY):
+            return self._query_info(udid, key=query, deadline=deadline)
+        if query == CAPACITY_QUERY:
+            return self._query_info(udid, DISK_USAGE_DOMAIN, CAPACITY_QUERY, deadline)
+        return self._query_info(udid, query, deadline=deadline)
+
+    def submit_query(self, udid, query, deadline=None):
+        """
+        Run one query in the worker pool.
+        Returns a Future of the query value.
+        """
+        return self.executor.submit(self._run_query, udid, query, deadline)
+
+    def query_command(self, udid, query):
+        """
+        Tool invocation (run_command arguments) and parser of a query,
+        for callers that run the command themselves (e.g. asynchronously).
+        parse(result, error) returns the query value.
+        Returns None for queries that are not a single command (pairing
+        check, native usbmuxd backend), use submit_query for those.
+        """
+        if query == TRUST_QUERY or (self.use_usbmux and udid in self.usbmux_ids):
+            return None
+        if query == PUBLIC_QUERY:
+            return self._public_command(udid)
+        if query in (VERSION_QUERY, NAME_QUERY):
+            return self._ideviceinfo_command(udid, key=query)
+        if query == CAPACITY_QUERY:
+            return self._ideviceinfo_command(udid, DISK_USAGE_DOMAIN, CAPACITY_QUERY)
+        return self._ideviceinfo_command(udid, query)
+
+    def _run_ideviceinfo(self, udid, domain=None, key=None, deadline=None):
+        """
+        Run a single ideviceinfo query for one device in XML mode.
+        Returns parsed plist dict (value for key queries) or None on failure.
+        """
+        return self._run_parsed(*self._ideviceinfo_command(udid, domain, key), deadline)
+
+    def _ideviceinfo_command(self, udid, domain=None, key=None):
+        command = ['ideviceinfo', '-u', udid, '-x']
+        timeout = 10
+        if domain:
+            command.extend(['-q', domain])
+            timeout = 5
+        if key:
+            command.extend(['-k', key])
+            timeout = 5
+
+        command = {
+            'command': command,
+            'timeout': timeout,
+            'udid': udid,
+            'label': key or domain or 'base',
+            'token': self._device_token(udid),
+        }
+        return command, partial(self._parse_ideviceinfo, udid, domain)
+
+    def _parse_ideviceinfo(self, udid, domain, result, error):
+        if isinstance(error, FileNotFoundError):
             logger.error("ideviceinfo not found")
             return None
+        if error:
+            logger.warning(
+                "ideviceinfo query %s failed for %s: %s",
+                domain or "base", udid, error
+            )
+            return None
+
+        if result.returncode != 0:
+            logger.warning(
+                "ideviceinfo query %s failed for %s",
+                domain or "base", udid
+            )
+            return None
+
+        try:
+            return parse_plist_output(result.stdout)
+        except (plistlib.InvalidFileException, ExpatError, ValueError) as e:
+            logger.warning(
+                "Could not parse ideviceinfo %s output for %s: %s",
+                domain or "base", udid, e
+            )
+            return None
+
+    def _build_device(self, udid, results, trusted=True):
+        """
+        Create a Device from the collected domain query results.
+        Untrusted devices only have the public base values.
+        Returns None if the base query failed.
+        """
+        device_data = results.get(None)
+        if device_data is None:
+            return None
+
+        # Create device object
+        device = Device(udid)
+        device.name = device_data.get('DeviceName', None)
+        device.model = device_data.get('ProductType', None)
+        device.friendly_model = get_friendly_model_name(device.model)
+        device.ios_version = device_data.get('ProductVersion', None)
+        device.build_version = device_data.get('BuildVersion', None)
+        device.serial_number = device_data.get('SerialNumber', None)
+        device.hardware_model = device_data.get('HardwareModel', None)
+        device.wifi_mac = device_data.get('WiFiAddress', None)
+        device.bluetooth_mac = device_data.get('BluetoothAddress', None)
+
+        # Scans only ask for the capacity, the full domain is fetched
+        # when the details are shown
+        total_bytes = results.get(CAPACITY_QUERY)
+        if isinstance(total_bytes, int):
+            device.storage_total = total_bytes / (1000**3)
+
+        for domain in EXTENDED_DOMAINS:
+            if results.get(domain):
+                apply_domain(device, domain, results[domain])
+
+        device.is_trusted = trusted
+
+        total_gb = device.storage_total if device.storage_total else 0
+
+        # Log device info
+        logger.info(
+            "Device: %s (%s, iOS %s, %.0fGB total, Trusted: %s)",
+            device.name or "Unknown",
+            device.model or "Unknown",
+            device.ios_version or "Unknown",
+            total_gb,
+            device.is_trusted
+        )
+
+        return device
+
+    def get_device_info(self, udid, extended=False):
+        """
+        Get device information for given UDID.
+        With extended=True storage and battery domains are included.
+        Returns device object with name, model & iOS version.
+        """
+        logger.info("Getting device info for UDID: %s", udid)
+
+        devices = self._collect_devices([udid])
+        if not devices:
+            return None
+
+        device = devices[0]
+        if extended:
+            for domain, data in self.fetch_extended_info(udid).items():
+                apply_domain(device, domain, data)
+        return device
 
-    def refresh_devices(self):
+    def fetch_extended_info(self, udid, domains=EXTENDED_DOMAINS, on_domain=None):
+        """
+        Query domains that are not part of a scan, in parallel.
+        Cached values are reused until they expire. on_domain(domain, data)
+        is called from the worker thread as each domain arrives.
+        Returns dict of domain data, failed domains are left out.
+        """
+        results = {}
+        futures = {}
+        for domain in domains:
+            data = self.cache.get(udid, domain)
+            if data is None:
+                futures[self.executor.submit(self._query_info, udid, domain)] = domain
+            else:
+                results[domain] = data
+                if on_domain:
+                    on_domain(domain, data)
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                domain = futures[future]
+                try:
+                    data = future.result()
+                except Cancelled:
+                    data = None
+                except Exception as e:
+                    logger.warning("Query %s failed for %s: %s", domain, udid, e)
+                    data = None
+
+                if data is None:
+                    continue
+                self.cache.put(udid, domain, data)
+                results[domain] = data
+                if on_domain:
+                    on_domain(domain, data)
+
+        return results
+
+    def query_devices(self, udids, on_device=None):
+        """
+        Get device information for several UDIDs concurrently.
+        Returns Device list, devices that did not answer are left out.
+        """
+        return self._collect_devices(udids, on_device)
+
+    def _initial_queries(self, udid):
+        """
+        Return the queries needed for a device.
+        New devices start with the pairing check, known devices only
+        check their iOS version and name.
+        """
+        if self.cache.get(udid, None) is None:
+            return [TRUST_QUERY]
+
+        queries = [VERSION_QUERY, NAME_QUERY]
+        if self.cache.get(udid, CAPACITY_QUERY) is None:
+            queries.append(CAPACITY_QUERY)
+        return queries
+
+    def _collect_devices(self, udids, on_device=None):
+        """
+        Query the given devices in the worker pool.
+        Each device is passed to on_device as soon as all of its
+        queries are done. Gives up on devices that have not answered
+        when the scan deadline expires or the manager is closed.
+        Returns Device list in the given order.
+        """
+        scan = ScanState(self, udids)
+        futures = {}
+
+        def submit(udid, query):
+            future = self.submit_query(udid, query, scan.deadline)
+            futures[future] = (udid, query)
+            return future
+
+        pending = {submit(udid, query) for udid, query in scan.start()}
+        while pending:
+            if self.token.cancelled or scan.deadline.expired:
+                for future in pending:
+                    future.cancel()
+                scan.give_up("cancelled" if self.token.cancelled else None)
+                break
+
+            done, pending = wait(
+                pending, timeout=scan.deadline.remaining(), return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                udid, query = futures.pop(future)
+                try:
+                    value = future.result()
+                except Cancelled:
+                    value = None
+                except Exception as e:
+                    logger.warning("Query %s failed for %s: %s", query, udid, e)
+                    value = None
+
+                follow_up, device = scan.result(udid, query, value)
+                for next_udid, next_query in follow_up:
+                    pending.add(submit(next_udid, next_query))
+                if device and on_device:
+                    on_device(device)
+
+        return scan.devices()
+
+    def _finish_device(self, udid, results):
+        """
+        Merge fresh results with cached ones and build the Device.
+        Extended domains fetched earlier are included while still cached.
+        """
+        if VERSION_QUERY in results and results.pop(VERSION_QUERY) is None:
+            # Cheap check failed, device is gone or not reachable
+            return None
+
+        name = results.pop(NAME_QUERY, None)
+        base = self.cache.get(udid, None)
+        if name and None not in results and base and base.get('DeviceName') != name:
+            logger.info("Device %s was renamed to %s", udid, name)
+            self.cache.put(udid, None, dict(base, DeviceName=name))
+
+        results.pop(TRUST_QUERY, None)
+        public_queried = PUBLIC_QUERY in results
+        public = results.pop(PUBLIC_QUERY, None)
+        if public_queried and results.get(None) is None:
+            # Only public values, nothing is cached so the next scan
+            # checks the pairing again
+            if public is None:
+                return None
+            return self._build_device(udid, {None: public}, trusted=False)
+
+        merged = {}
+        for query in SCAN_QUERIES:
+            if query in results:
+                data = results[query]
+                if data is not None:
+                    self.cache.put(udid, query, data)
+            else:
+                data = self.cache.get(udid, query)
+            merged[query] = data
+
+        for domain in EXTENDED_DOMAINS:
+            merged[domain] = self.cache.get(udid, domain)
+
+        return self._build_device(udid, merged)
+
+    def refresh_devices(self, on_device=None):
         """
         Scan for devices and return list of Device objects.
-        Main function that combines everything.
+        Every (device, query) pair runs in the worker pool, each device
+        is passed to on_device as soon as all of its queries are done.
         """
         logger.info("Starting device refresh scan")
 
@@ -280,14 +981,8 @@ class DeviceManager:
             logger.info("No devices connected")
             return []
 
-        # Get info for each device
-        devices = []
-        for udid in udids:
-            device = self.get_device_info(udid)
-            if device:
-                devices.append(device)
-            else:
-                logger.warning("Could not get info for %s", udid)
+        # Keep idevice_id order
+        devices = self._collect_devices(udids, on_device)
 
         logger.info("Device refresh complete: %d device(s)", len(devices))
         return devices
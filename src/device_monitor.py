@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+"""
+Live monitor of battery and storage values for the details dialog.
+Samples are read over the persistent lockdown connection of the device,
+so no process is started per sample while usbmuxd is reachable.
+"""
+
+import os
+import threading
+from device_manager import BATTERY_DOMAIN, DISK_USAGE_DOMAIN
+from logger_config import get_logger
+
+logger = get_logger('device_monitor')
+
+# Seconds between samples
+MONITOR_INTERVAL = float(os.environ.get('PARDUS_IDEVICE_MOUNTER_MONITOR_INTERVAL', 5))
+
+
+class DeviceMonitor:
+    """
+    Samples volatile domains of one device in a background thread.
+    on_sample(domain, data) is called from the monitor thread, with
+    read_storage given, on_storage(total_bytes, available_bytes) is
+    called instead of reading the disk_usage domain.
+    """
+
+    def __init__(self, device_manager, udid, on_sample, interval=MONITOR_INTERVAL,
+                 read_storage=None, on_storage=None):
+        self.device_manager = device_manager
+        self.udid = udid
+        self.on_sample = on_sample
+        self.interval = max(1.0, interval)
+        self.read_storage = read_storage
+        self.on_storage = on_storage
+        self.stopped = threading.Event()
+        self.thread = None
+
+        self.domains = [BATTERY_DOMAIN]
+        if read_storage is None:
+            self.domains.append(DISK_USAGE_DOMAIN)
+
+    def start(self):
+        if self.thread:
+            return
+        self.thread = threading.Thread(
+            target=self._run, name=f'monitor-{self.udid[:8]}', daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stops sampling, no callback is made after this returns
+        except for a sample already being delivered.
+        """
+        self.stopped.set()
+
+    def _run(self):
+        logger.debug("Monitoring %s every %.1fs", self.udid, self.interval)
+        while not self.stopped.wait(self.interval):
+            for domain in self.domains:
+                data = self.device_manager.read_domain_live(self.udid, domain)
+                if self.stopped.is_set():
+                    return
+                if data is not None:
+                    self.on_sample(domain, data)
+
+            if self.read_storage:
+                storage = self.read_storage()
+                if storage and not self.stopped.is_set():
+                    self.on_storage(*storage)
+        logger.debug("Stopped monitoring %s", self.udid)
@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+"""
+On-disk snapshot of the last known device list.
+Lets the main window show devices immediately on startup while a
+background scan revalidates them.
+Snapshot file path: ~/.local/share/pardus-idevice-mounter/devices.json
+"""
+
+import json
+import os
+from pathlib import Path
+from device_manager import Device
+from logger_config import get_logger
+
+logger = get_logger('device_snapshot')
+
+SNAPSHOT_FILE = (
+    Path.home() / ".local" / "share" / "pardus-idevice-mounter" / "devices.json"
+)
+
+
+def load_snapshot(path=SNAPSHOT_FILE):
+    """
+    Load devices of the last scan.
+    Returns list of Device objects, empty if there is no usable snapshot.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError) as e:
+        logger.warning("Could not read device snapshot: %s", e)
+        return []
+
+    devices = []
+    for entry in entries if isinstance(entries, list) else []:
+        if isinstance(entry, dict) and entry.get('udid'):
+            devices.append(Device.from_dict(entry))
+
+    logger.info("Loaded %d device(s) from snapshot", len(devices))
+    return devices
+
+
+def save_snapshot(devices, path=SNAPSHOT_FILE):
+    """
+    Save devices atomically so a crash never leaves a broken snapshot.
+    """
+    path = Path(path)
+    tmp_path = path.with_suffix('.tmp')
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(
+                [device.to_dict() for device in devices],
+                f,
+                separators=(',', ':')
+            )
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning("Could not save device snapshot: %s", e)
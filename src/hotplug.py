@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+"""
+Hotplug monitor for iPhone/iPad attach and detach events.
+Subscribes to usbmuxd "Listen" notifications in a background thread.
+"""
+
+import threading
+from logger_config import get_logger
+import usbmux
+
+logger = get_logger('hotplug')
+
+# Reconnect delays when usbmuxd is not reachable (seconds)
+MIN_BACKOFF = 1
+MAX_BACKOFF = 30
+
+
+class HotplugMonitor:
+    """
+    Calls on_attach(udid), on_detach(udid) and on_paired(udid) from a
+    background thread. usbmuxd reports every already connected device
+    as attached right after subscribing, on_paired follows a "Trust"
+    confirmation on the device.
+    """
+
+    def __init__(self, on_attach, on_detach, on_paired=None):
+        self.on_attach = on_attach
+        self.on_detach = on_detach
+        self.on_paired = on_paired
+        self.client = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+        # usbmuxd detach events only carry the numeric device id
+        self.device_udids = {}
+
+    def start(self):
+        if self.thread:
+            return
+        self.thread = threading.Thread(target=self._run, name='hotplug', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        client = self.client
+        if client:
+            client.close()
+
+    def _run(self):
+        backoff = MIN_BACKOFF
+        while not self.stopped.is_set():
+            try:
+                self.client = usbmux.UsbmuxClient()
+                logger.info("Listening for device hotplug events")
+                for message in self.client.listen():
+                    backoff = MIN_BACKOFF
+                    self._handle_message(message)
+            except (usbmux.UsbmuxError, OSError) as e:
+                if self.stopped.is_set():
+                    break
+                logger.warning("Hotplug listener disconnected: %s", e)
+            finally:
+                if self.client:
+                    self.client.close()
+                    self.client = None
+
+            if self.stopped.is_set():
+                break
+
+            # Devices are reported again after reconnecting
+            for udid in list(self.device_udids.values()):
+                self.on_detach(udid)
+            self.device_udids.clear()
+
+            self.stopped.wait(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
+    def _handle_message(self, message):
+        message_type = message.get('MessageType')
+        device_id = message.get('DeviceID')
+
+        if message_type == 'Attached':
+            properties = message.get('Properties', {})
+            udid = properties.get('SerialNumber')
+            if not udid or properties.get('ConnectionType', 'USB') != 'USB':
+                return
+            self.device_udids[device_id] = udid
+            logger.info("Device attached: %s", udid)
+            self.on_attach(udid)
+
+        elif message_type == 'Paired':
+            udid = self.device_udids.get(device_id)
+            if udid and self.on_paired:
+                logger.info("Device paired: %s", udid)
+                self.on_paired(udid)
+
+        elif message_type == 'Detached':
+            udid = self.device_udids.pop(device_id, None)
+            if udid:
+                logger.info("Device detached: %s", udid)
+                self.on_detach(udid)
@@ -4,31 +4,194 @@
 """
 Pardus iDevice Mounter Logging Configuration
 Log file path: ~/.local/share/pardus-idevice-mounter/logs/app.log
+Callers only put records on a bounded queue, a background thread writes
+them to the file in batches. Warnings and errors are printed to the
+console right away, also before setup_logging(). Records logged before
+setup_logging() wait in the queue, or are written at exit if it never ran.
+
+Set PARDUS_IDEVICE_MOUNTER_LOG_FORMAT=json to write JSON lines
+(logs/app.jsonl) instead of plain text.
 """
 
+import atexit
+import json
 import logging
 import logging.handlers
+import os
+import queue
+import threading
+import time
 from pathlib import Path
 
+LOG_FORMAT = os.environ.get('PARDUS_IDEVICE_MOUNTER_LOG_FORMAT', 'text')
+
+# Records waiting for the writer, new records are dropped when full
+QUEUE_SIZE = 10000
+
+# Writer flushes after this many records or seconds, whichever comes first
+BATCH_SIZE = 256
+FLUSH_INTERVAL = 0.5
+
+_STOP = object()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line.
+    """
+
+    def format(self, record):
+        entry = {
+            'time': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _BatchFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler that only flushes when the writer asks.
+    """
+
+    def flush(self):
+        pass
+
+    def flush_batch(self):
+        super().flush()
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Never blocks the caller, counts records that do not fit.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _LogWriter(threading.Thread):
+    """
+    Drains the queue and hands records to the real handlers.
+    """
+
+    def __init__(self, log_queue, queue_handler, handlers):
+        super().__init__(name='log-writer', daemon=True)
+        self.queue = log_queue
+        self.queue_handler = queue_handler
+        self.handlers = handlers
+        self.reported_drops = 0
+
+    def run(self):
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            try:
+                while len(batch) < BATCH_SIZE and batch[-1] is not _STOP:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                pass
+
+            for record in batch:
+                if record is _STOP:
+                    running = False
+                    continue
+                self._handle(record)
+
+            self._report_drops()
+            for handler in self.handlers:
+                if isinstance(handler, _BatchFileHandler):
+                    handler.flush_batch()
+
+    def _handle(self, record):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def _report_drops(self):
+        dropped = self.queue_handler.dropped
+        if dropped == self.reported_drops:
+            return
+        record = logging.LogRecord(
+            'pardus-idevice-mounter', logging.WARNING, __file__, 0,
+            "%d log records dropped, queue full", (dropped - self.reported_drops,),
+            None
+        )
+        self.reported_drops = dropped
+        self._handle(record)
+
+    def stop(self):
+        try:
+            self.queue.put(_STOP, timeout=1)
+        except queue.Full:
+            return
+        self.join(timeout=2)
+
+
+def _install_handlers():
+    logger = logging.getLogger('pardus-idevice-mounter')
+    logger.setLevel(logging.INFO)
+    handler = _DroppingQueueHandler(queue.Queue(QUEUE_SIZE))
+    logger.addHandler(handler)
 
-def setup_logging():
+    # Console handler (only WARNING and above to console)
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.WARNING)
+    console_handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
+    logger.addHandler(console_handler)
+    return handler
 
-    # Create log directory
-    log_dir = Path.home() / ".local" / "share" / "pardus-idevice-mounter" / "logs"
-    log_dir.mkdir(parents=True, exist_ok=True)
 
-    log_file = log_dir / "app.log"
+def _write_early_records():
+    """
+    Writes queued records of a process that exits before setup_logging(),
+    e.g. after the window failed to load.
+    """
+    if _writer is None and not _queue_handler.queue.empty():
+        try:
+            setup_logging()
+        except OSError:
+            return
+        _writer.stop()
+
+
+def setup_logging():
+
+    global _writer
 
     # Logger config
     logger = logging.getLogger('pardus-idevice-mounter')
     logger.setLevel(logging.INFO)
 
-    # If handlers already added, skip setup
-    if logger.handlers:
+    # If writer already started, skip setup
+    if _writer is not None:
         return logger
 
+    # Create log directory
+    log_dir = Path.home() / ".local" / "share" / "pardus-idevice-mounter" / "logs"
+    log_dir.mkdir(parents=True, exist_ok=True)
+
+    log_file = log_dir / ("app.jsonl" if LOG_FORMAT == 'json' else "app.log")
+
     # File handler (5MB, 2 backup files = max 15MB total)
-    file_handler = logging.handlers.RotatingFileHandler(
+    file_handler = _BatchFileHandler(
         log_file,
         maxBytes=5*1024*1024,  # 5MB
         backupCount=2,
@@ -36,33 +199,33 @@ def setup_logging():
     )
     file_handler.setLevel(logging.INFO)
 
-    # Console handler (only WARNING and above to console)
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.WARNING)
-
-    formatter = logging.Formatter(
-        '%(asctime)s [%(levelname)s] %(name)s: %(message)s',
-        datefmt='%H:%M:%S'
-    )
-
-    # Simple format for console
-    console_formatter = logging.Formatter(
-        '%(levelname)s: %(message)s'
-    )
+    if LOG_FORMAT == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            '%(asctime)s [%(levelname)s] %(name)s: %(message)s',
+            datefmt='%H:%M:%S'
+        )
 
     file_handler.setFormatter(formatter)
-    console_handler.setFormatter(console_formatter)
 
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    # Records queued before setup are written first
+    _writer = _LogWriter(_queue_handler.queue, _queue_handler, [file_handler])
+    _writer.start()
+    atexit.register(_writer.stop)
 
     # Initial log message
     logger.info("Pardus iDevice Mounter logging system initialized")
-    logger.debug(f"Log file: {log_file}")
+    logger.debug("Log file: %s", log_file)
 
     return logger
 
 
+def get_dropped_count():
+    """Number of records dropped because the queue was full"""
+    return _queue_handler.dropped
+
+
 def get_logger(name=None):
     """Get logger instance for specific module"""
     if name:
@@ -70,5 +233,7 @@ def get_logger(name=None):
     return logging.getLogger('pardus-idevice-mounter')
 
 
-# Init logging on import
-_logger = setup_logging()
+# Queue records on import, setup_logging() is called by the entry points
+_queue_handler = _install_handlers()
+_writer = None
+atexit.register(_write_early_records)
@@ -1,10 +1,25 @@
 #!/usr/bin/python3
 import sys
+import startup_profile
+
+# Print a time breakdown up to the first frame
+if '--profile-startup' in sys.argv:
+    sys.argv.remove('--profile-startup')
+    startup_profile.enable()
+
+import cli
+
+# Headless commands run without loading gi/Gtk
+if cli.is_cli_command(sys.argv[1:]):
+    sys.exit(cli.main(sys.argv[1:]))
+
 import gi
 
 gi.require_version('Gtk', '3.0')
 from gi.repository import GLib, Gio, Gtk
+startup_profile.mark('gi/Gtk import')
 from main_window import MainWindow
+startup_profile.mark('app modules import')
 
 
 class Application(Gtk.Application):
@@ -2,33 +2,58 @@
 
 
 import os
+import signal
 import threading
 import gi
 gi.require_version('Gtk', '3.0')
-from gi.repository import Gtk, GLib
-from device_manager import DeviceManager
-from logger_config import get_logger
+from gi.repository import Gio, Gtk, GLib
+from async_runner import AsyncScan
+from command_runner import METRICS_FILE, metrics
+from device_manager import (
+    BATTERY_DOMAIN, EXTENDED_DOMAINS, DeviceManager, apply_domain
+)
+from device_list import DeviceItem, DeviceRowFactory
+from device_monitor import DeviceMonitor
+from device_snapshot import load_snapshot, save_snapshot
+from hotplug import HotplugMonitor
+from logger_config import get_logger, setup_logging
 from mount_manager import MountManager
+from mount_watcher import MountWatcher
+from open_files import describe_holders
+import startup_profile
 
 logger = get_logger('main_window')
 
 import locale
 from locale import gettext as _
 
-# Development: ../locale, Production: /usr/share/locale
-localedir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../locale')
-if not os.path.exists(localedir):
-    localedir = '/usr/share/locale'
+# Objects built at startup, dialogs are built on first use
+MAIN_OBJECTS = ["main_window", "menu_popover"]
 
-locale.setlocale(locale.LC_ALL, '')
-locale.bindtextdomain('pardus-idevice-mounter', localedir)
-locale.textdomain('pardus-idevice-mounter')
-_ = locale.gettext
+# Pairing re-check of untrusted devices (seconds)
+TRUST_CHECK_INTERVAL = 3
+
+
+def init_locale():
+    """
+    Sets up translations, called once before the main window is built.
+    """
+    # Development: ../locale, Production: /usr/share/locale
+    localedir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../locale')
+    if not os.path.exists(localedir):
+        localedir = '/usr/share/locale'
+
+    locale.setlocale(locale.LC_ALL, '')
+    locale.bindtextdomain('pardus-idevice-mounter', localedir)
+    locale.textdomain('pardus-idevice-mounter')
 
 
 class MainWindow(Gtk.Window):
     def __init__(self, application):
         """Initializes the main window."""
+        init_locale()
+        startup_profile.mark('locale')
+
         super().__init__(application=application)
         self.builder = Gtk.Builder()
         self.glade_file = os.path.join(
@@ -36,20 +61,99 @@ class MainWindow(Gtk.Window):
             "../ui/main_window.glade"
         )
         try:
-            self.builder.add_from_file(self.glade_file)
+            self.builder.add_objects_from_file(self.glade_file, MAIN_OBJECTS)
         except (FileNotFoundError, GLib.Error) as e:
-            logger.error(f"Error loading glade file: {e}")
+            logger.error("Error loading glade file: %s", e)
             return
+        startup_profile.mark('glade main window')
 
         self.device_manager = DeviceManager()
-        self.mount_manager = MountManager()
-        self.mount_manager.cleanup_stale_mounts()
+        self.mount_manager = MountManager(
+            auto_remount=True,
+            on_mount_lost=lambda mount_point, error: GLib.idle_add(
+                self._on_mount_lost, mount_point, error),
+            on_remounted=lambda device, mount_point: GLib.idle_add(
+                self._on_remounted, device.udid, mount_point),
+        )
+
+        self.is_scanning = False
+        self.rescan_pending = False
+        # Running full scan, and attached devices left to it
+        self.current_scan = None
+        self.attached_during_scan = set()
+        self.is_batch_running = False
+
+        # Items of listed devices, keyed by UDID
+        self.device_items = {}
+
+        # Dialogs, built on first use
+        self.device_dialog = None
+        self.device_details_dialog = None
+
+        # Device shown in the details dialog and its live monitor
+        self.details_device = None
+        self.details_monitor = None
+
+        # Pairing re-check of untrusted rows
+        self.trust_check_id = None
+        self.is_trust_checking = False
+
+        # Item offered in the banner to unmount once its files are closed
+        self.release_item = None
+
+        self.hotplug_monitor = HotplugMonitor(
+            on_attach=lambda udid: GLib.idle_add(self._on_device_attached, udid),
+            on_detach=lambda udid: GLib.idle_add(self._on_device_detached, udid),
+            on_paired=lambda udid: GLib.idle_add(self._query_device, udid)
+        )
+        self.mount_watcher = MountWatcher(
+            self.mount_manager,
+            on_unmounted=lambda mount_point: GLib.idle_add(
+                self._on_external_unmount, mount_point)
+        )
 
         self.init_widgets()
         self.init_signals()
-        self.set_version()
 
-        self.is_scanning = False
+        # Rows of the last session are part of the first frame
+        self._show_snapshot()
+        startup_profile.mark('window constructed')
+
+        self.first_draw_handler = self.connect_after("draw", self._on_first_draw)
+
+    def _on_first_draw(self, widget, cairo_context):
+        """
+        Defers the remaining startup work until the first frame is drawn.
+        """
+        self.disconnect(self.first_draw_handler)
+        startup_profile.mark('first frame')
+        startup_profile.report()
+
+        GLib.idle_add(self._finish_startup)
+        return False
+
+    def _finish_startup(self):
+        """
+        Startup work that is not needed for the first frame.
+        """
+        setup_logging()
+
+        self.hotplug_monitor.start()
+        self.mount_watcher.start()
+
+        # kill -USR1 <pid> exports command metrics
+        GLib.unix_signal_add(
+            GLib.PRIORITY_DEFAULT, signal.SIGUSR1, self._on_export_metrics
+        )
+
+        # Clean up previous sessions in the background
+        self._start_cleanup()
+
+        # Revalidate the devices of the last session
+        if self.device_items:
+            self.on_scan_button_clicked(None)
+
+        return False
 
     def init_widgets(self):
         """
@@ -86,14 +190,41 @@ class MainWindow(Gtk.Window):
             self.set_icon_name(glade_window.get_icon_name())
 
         self.menu_popover = self.builder.get_object("menu_popover")
+        self.mount_all_button = self.builder.get_object("mount_all_button")
+        # Rows are built from the glade row template per item
         self.list_box = self.builder.get_object("list_box")
-        self.device_dialog = self.builder.get_object("device_dialog")
-        if self.device_dialog:
+        self.device_store = Gio.ListStore(item_type=DeviceItem)
+        self.row_factory = DeviceRowFactory(
+            self.glade_file, self._on_row_mount_toggle, self._on_row_details_clicked
+        )
+        self.list_box.bind_model(self.device_store, self.row_factory.create_row)
+
+        self.show_all()
+
+    def _build_object(self, object_id):
+        """
+        Builds an object of the glade file that was skipped at startup.
+        """
+        self.builder.add_objects_from_file(self.glade_file, [object_id])
+        return self.builder.get_object(object_id)
+
+    def get_device_dialog(self):
+        """
+        Returns the about dialog, builds it on first use.
+        """
+        if self.device_dialog is None:
+            self.device_dialog = self._build_object("device_dialog")
             self.device_dialog.set_transient_for(self)
             self.device_dialog.set_position(Gtk.WindowPosition.CENTER_ON_PARENT)
+            self.set_version()
+        return self.device_dialog
 
-        self.device_details_dialog = self.builder.get_object("device_details_dialog")
-        if self.device_details_dialog:
+    def get_device_details_dialog(self):
+        """
+        Returns the device details dialog, builds it on first use.
+        """
+        if self.device_details_dialog is None:
+            self.device_details_dialog = self._build_object("device_details_dialog")
             self.device_details_dialog.set_transient_for(self)
             self.device_details_dialog.set_modal(True)
             self.device_details_dialog.set_resizable(False)
@@ -101,8 +232,7 @@ class MainWindow(Gtk.Window):
             close_button = self.builder.get_object("close_button")
             if close_button:
                 close_button.connect("clicked", self._on_details_dialog_close)
-
-        self.show_all()
+        return self.device_details_dialog
 
     def init_signals(self):
         """
@@ -113,8 +243,11 @@ class MainWindow(Gtk.Window):
             "on_scan_button_clicked": self.on_scan_button_clicked,
             "on_retry_button_clicked": self.on_scan_button_clicked,
             "on_menu_about_button_clicked": self.on_menu_about_button_clicked,
-            "on_banner_close_button_clicked": self.on_banner_close_button_clicked
+            "on_mount_all_button_clicked": self.on_mount_all_button_clicked,
+            "on_banner_close_button_clicked": self.on_banner_close_button_clicked,
+            "on_banner_wait_button_clicked": self.on_banner_wait_button_clicked
         })
+        self.connect("destroy", self.on_destroy)
 
     def set_version(self):
         """
@@ -132,11 +265,38 @@ class MainWindow(Gtk.Window):
         except FileNotFoundError:
             pass
 
+    def on_destroy(self, widget):
+        """
+        Releases device connections when the window is closed.
+        """
+        self.hotplug_monitor.stop()
+        self.mount_watcher.stop()
+        if self.details_monitor:
+            self.details_monitor.stop()
+        self.device_manager.close()
+        self.mount_manager.close()
+
+        save_snapshot([
+            item.device for item in self.device_items.values() if item.is_verified
+        ])
+
+        if METRICS_FILE:
+            metrics.write()
+
+    def _on_export_metrics(self):
+        """
+        Writes command metrics in the background.
+        """
+        threading.Thread(target=metrics.write, daemon=True).start()
+        return True
+
     def on_scan_button_clicked(self, widget):
         """
         Handles the scan button click event.
         """
         if self.is_scanning:
+            # Scan again once the current scan has finished
+            self.rescan_pending = True
             return
 
         self.is_scanning = True
@@ -144,10 +304,139 @@ class MainWindow(Gtk.Window):
         if self.status_stack:
             self.status_stack.set_visible_child_name("loading")
 
-        thread = threading.Thread(target=self._scan_devices_thread)
+        # Runs on the main loop, rows are added as devices answer
+        try:
+            self.current_scan = AsyncScan(
+                self.device_manager,
+                on_device=self._add_device_row,
+                on_finished=self._update_ui_with_devices
+            )
+            self.current_scan.start()
+        except Exception as e:
+            logger.error("Device scan error: %s", e)
+            self._handle_scan_error(e)
+
+    def on_mount_all_button_clicked(self, widget):
+        """
+        Mounts all trusted devices in parallel, or unmounts all
+        if every device is already mounted.
+        """
+        if self.is_batch_running:
+            return
+
+        items = [item for item in self.device_items.values()
+                 if item.is_verified and not item.is_busy]
+        to_mount = [item for item in items
+                    if not item.is_mounted and item.device.is_trusted]
+        to_unmount = [item for item in items if item.is_mounted]
+
+        if to_mount:
+            logger.info("Mounting %d devices", len(to_mount))
+            label = _("Mounting…")
+            target = self._mount_all_thread
+            batch_items = to_mount
+        elif to_unmount:
+            logger.info("Unmounting %d devices", len(to_unmount))
+            label = _("Unmounting…")
+            target = self._unmount_all_thread
+            batch_items = to_unmount
+        else:
+            return
+
+        self.is_batch_running = True
+        self.mount_all_button.set_sensitive(False)
+        for item in batch_items:
+            item.is_busy = True
+            item.busy_label = label
+            item.changed()
+
+        thread = threading.Thread(target=target, args=(batch_items,))
         thread.daemon = True
         thread.start()
 
+    def _mount_all_thread(self, items):
+        """
+        Runs in a separate thread, each row is updated as its device finishes.
+        """
+        items_by_udid = {item.device.udid: item for item in items}
+
+        def on_result(device, result):
+            GLib.idle_add(
+                self._on_mount_finished, items_by_udid[device.udid], device,
+                result['success'], result.get('mount_point'), result['error'], True
+            )
+
+        try:
+            _results, summary = self.mount_manager.mount_all(
+                [item.device for item in items], on_result=on_result
+            )
+        except Exception as e:
+            logger.error("Mount all error: %s", e)
+            summary = None
+        GLib.idle_add(self._on_batch_finished, items, True, summary)
+
+    def _unmount_all_thread(self, items):
+        """
+        Runs in a separate thread, each row is updated as its mount finishes.
+        """
+        items_by_mount = {item.mount_point: item for item in items}
+
+        def on_result(mount_point, result):
+            item = items_by_mount[mount_point]
+            GLib.idle_add(
+                self._on_unmount_finished, item, item.device,
+                result['success'], result['error'], True
+            )
+
+        try:
+            _results, summary = self.mount_manager.unmount_all(
+                list(items_by_mount), on_result=on_result
+            )
+        except Exception as e:
+            logger.error("Unmount all error: %s", e)
+            summary = None
+        GLib.idle_add(self._on_batch_finished, items, False, summary)
+
+    def _on_batch_finished(self, items, mounting, summary):
+        """
+        Shows the aggregate result of a mount/unmount all.
+        """
+        self.is_batch_running = False
+        self._update_mount_all_button()
+
+        if summary is None:
+            self._show_banner_message(_("Operation failed"))
+        elif mounting:
+            self._show_banner_message(_("{} of {} devices mounted").format(
+                summary['succeeded'], summary['total']))
+        else:
+            self._show_banner_message(_("{} of {} devices unmounted").format(
+                summary['succeeded'], summary['total']))
+
+        # Items are left busy if the batch itself failed
+        for item in items:
+            if item.is_busy:
+                item.is_busy = False
+                item.changed()
+        return False
+
+    def _update_mount_all_button(self):
+        """
+        Enables the header bar button if any device can be (un)mounted.
+        """
+        if not self.mount_all_button:
+            return
+
+        items = [item for item in self.device_items.values() if item.is_verified]
+        can_mount = any(not item.is_mounted and item.device.is_trusted for item in items)
+        can_unmount = any(item.is_mounted for item in items)
+
+        label = _("Mount All") if can_mount or not can_unmount else _("Unmount All")
+        if self.mount_all_button.get_label() != label:
+            self.mount_all_button.set_label(label)
+        self.mount_all_button.set_sensitive(
+            not self.is_batch_running and (can_mount or can_unmount))
+
     def on_banner_close_button_clicked(self, widget):
         """
         Handles the banner close button click event.
@@ -158,171 +447,377 @@ class MainWindow(Gtk.Window):
 
             GLib.timeout_add(100, self._resize_window_after_banner)
 
+    def on_banner_wait_button_clicked(self, widget):
+        """
+        Unmounts the busy device of the banner once its files are closed.
+        """
+        item, self.release_item = self.release_item, None
+        widget.hide()
+        if item is None or item.is_busy or not item.is_mounted:
+            return
+
+        logger.info("Waiting to unmount device: %s", item.device.udid)
+        item.is_busy = True
+        item.busy_label = _("Waiting…")
+        item.changed()
+
+        thread = threading.Thread(
+            target=self._unmount_thread,
+            args=(item, item.device, item.mount_point, True)
+        )
+        thread.daemon = True
+        thread.start()
+
     def on_menu_about_button_clicked(self, widget):
         """
         Shows about & credits parts of the device dialog.
         """
         self.menu_popover.popdown()
-        self.device_dialog.run()
-        self.device_dialog.hide()
+        device_dialog = self.get_device_dialog()
+        device_dialog.run()
+        device_dialog.hide()
 
-    def _create_device_row(self, device):
+    def _start_cleanup(self):
         """
-        Creates a row for each device.
-        Sets device information to the row.
+        Runs stale mount cleanup in a background thread.
         """
-        # TODO: Add device model info (iphone13..)
-
-        logger.info(f"Creating row for device: {device.udid}")
-
-        row = Gtk.ListBoxRow()
-        row.device = device
-        row.is_mounted = False
-        row.mount_point = None
-
-        # Main box
-        main_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=2)
-        main_box.set_margin_start(8)
-        main_box.set_margin_end(8)
-        main_box.set_margin_top(6)
-        main_box.set_margin_bottom(6)
+        thread = threading.Thread(target=self.mount_manager.cleanup_stale_mounts)
+        thread.daemon = True
+        thread.start()
+        return False
 
-        # Icon and trustted status dot
-        icon_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=2)
-        icon = Gtk.Image.new_from_icon_name("phone-symbolic", Gtk.IconSize.LARGE_TOOLBAR)
-        icon.set_pixel_size(30)
+    def _show_snapshot(self):
+        """
+        Shows devices of the last session right away as unverified rows
+        and starts a scan to revalidate them.
+        """
+        devices = load_snapshot()
+        if not devices:
+            return
 
-        dot_label = Gtk.Label(label="●")
-        if device.is_trusted:
-            dot_label.set_markup('<span foreground="green">●</span>')
-        else:
-            dot_label.set_markup('<span foreground="red">●</span>')
+        # One model change for all rows
+        items = [DeviceItem(device, verified=False) for device in devices]
+        for item in items:
+            self.device_items[item.device.udid] = item
+        self.device_store.splice(0, 0, items)
+        self._update_mount_all_button()
 
-        icon_box.pack_start(icon, False, False, 0)
-        icon_box.pack_start(dot_label, False, False, 0)
+        if self.status_stack:
+            self.status_stack.set_visible_child_name("success")
 
-        # Device information box
-        info_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
-        info_box.set_hexpand(True)
+    def _schedule_trust_check(self):
+        """
+        Starts the periodic pairing check if it is not running.
+        """
+        if self.trust_check_id is None:
+            self.trust_check_id = GLib.timeout_add_seconds(
+                TRUST_CHECK_INTERVAL, self._on_trust_check_timer)
 
-        # Device name
-        name_label = Gtk.Label()
-        device_name = device.name or device.model or f'{_("Device")}_{device.udid}'
-        name_label.set_markup(f'<span weight="bold" size="larger">{device_name}</span>')
-        name_label.set_xalign(0)
+    def _on_trust_check_timer(self):
+        """
+        Re-checks pairing of untrusted devices, stops when there are none.
+        """
+        udids = [udid for udid, item in self.device_items.items()
+                 if item.is_verified and not item.device.is_trusted]
+        if not udids:
+            self.trust_check_id = None
+            return False
+
+        if not self.is_trust_checking:
+            self.is_trust_checking = True
+            thread = threading.Thread(
+                target=self._trust_check_thread, args=(udids,), daemon=True
+            )
+            thread.start()
+        return True
 
-        # Storage and iOS version
-        details_label = Gtk.Label()
-        storage_text = f"{device.storage_total:.0f}GB" if device.storage_total else _("Unknown")
-        ios_text = device.ios_version or _("Unknown")
-        details_label.set_text(f"{storage_text} · iOS {ios_text}")
-        details_label.set_xalign(0)
+    def _trust_check_thread(self, udids):
+        """
+        Runs in a separate thread, refetches devices that got paired.
+        """
+        try:
+            for udid in udids:
+                if self.device_manager.check_trust(udid):
+                    logger.info("Device %s is trusted now", udid)
+                    GLib.idle_add(self._query_device, udid)
+        finally:
+            self.is_trust_checking = False
 
-        # Trust status ve UDID
-        status_label = Gtk.Label()
-        trust_text = _("Trusted") if device.is_trusted else _("Not Trusted")
-        udid_short = device.udid[:8] + "..." if len(device.udid) > 8 else device.udid
-        status_label.set_markup(f'<span style="italic">{trust_text} · UDID: {udid_short}</span>')
-        status_label.set_xalign(0)
+    def _on_row_mount_toggle(self, item):
+        """
+        Mount - unmount jobs
+        Runs in a background thread, the row shows the progress.
+        """
+        if item.is_busy:
+            return
 
-        info_box.pack_start(name_label, False, False, 0)
-        info_box.pack_start(details_label, False, False, 0)
-        info_box.pack_start(status_label, False, False, 0)
+        device = item.device
+        item.is_busy = True
 
-        # Right side (Mount and details buttons)
-        button_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        if not item.is_mounted:
+            # Mount
+            logger.info("Mounting device: %s", device.udid)
+            item.busy_label = _("Mounting…")
+            target = self._mount_thread
+            args = (item, device)
+        else:
+            # Unmount
+            logger.info("Unmounting device: %s", device.udid)
+            item.busy_label = _("Unmounting…")
+            target = self._unmount_thread
+            args = (item, device, item.mount_point)
+        item.changed()
 
-        mount_button = Gtk.Button(label=_("Mount"))
-        mount_button.connect("clicked", self._on_row_mount_toggle, row)
-        row.mount_button = mount_button
+        thread = threading.Thread(target=target, args=args)
+        thread.daemon = True
+        thread.start()
 
-        details_button = Gtk.Button(label=_("Details"))
-        details_button.connect("clicked", self._on_row_details_clicked, device)
+    def _mount_thread(self, item, device):
+        """
+        This function runs in a separate thread to avoid ui freezing.
+        """
+        try:
+            result = self.mount_manager.mount_device(device)
+        except Exception as e:
+            result = (False, None, str(e))
+        GLib.idle_add(self._on_mount_finished, item, device, *result)
 
-        button_box.pack_start(mount_button, False, False, 0)
-        button_box.pack_start(details_button, False, False, 0)
+    def _unmount_thread(self, item, device, mount_point, wait_release=False):
+        """
+        This function runs in a separate thread to avoid ui freezing.
+        """
+        try:
+            result = self.mount_manager.unmount_device(
+                mount_point,
+                on_progress=lambda progress: GLib.idle_add(
+                    self._on_flush_progress, item, progress),
+                on_busy=lambda holders: GLib.idle_add(
+                    self._on_unmount_busy, item, holders, wait_release),
+                wait_release=wait_release
+            )
+        except Exception as e:
+            result = (False, str(e))
+        GLib.idle_add(self._on_unmount_finished, item, device, *result)
 
-        # Merge all boxes
-        main_box.pack_start(icon_box, False, False, 0)
-        main_box.pack_start(info_box, False, False, 0)
-        main_box.pack_start(button_box, False, False, 0)
+    def _on_flush_progress(self, item, progress):
+        """
+        Shows the remaining data, or the pending writes, of the mount
+        while it is flushed.
+        """
+        if not item.is_busy:
+            return False
+
+        if progress.dirty_bytes:
+            item.busy_label = _("Flushing… {:.1f} MB").format(
+                progress.dirty_bytes / (1000**2))
+        elif progress.waiting_requests:
+            item.busy_label = _("Flushing… {} writes left").format(
+                progress.waiting_requests)
+        else:
+            item.busy_label = _("Flushing…")
+        item.changed()
+        return False
 
-        row.add(main_box)
-        row.show_all()
+    def _on_unmount_busy(self, item, holders, waiting):
+        """
+        Names the processes that keep a mount busy.
+        Without waiting, the failure banner offers to wait for them.
+        """
+        if not waiting:
+            self.release_item = item
+            return False
 
-        return row
+        device_name = item.device.name or _("Device")
+        self._show_banner_message(_("Waiting for {} to close files on {}…").format(
+            describe_holders(holders) or _("other programs"), device_name))
+        return False
 
-    def _on_row_mount_toggle(self, widget, row):
+    def _on_mount_finished(self, item, device, success, mount_point, error_msg,
+                           batch=False):
         """
-        Mount - unmount jobs
+        Shows the mount result on the row.
+        Batch results only update the row, the summary goes to the banner.
         """
-        device = row.device
         device_name = device.name or _("Device")
+        item.is_busy = False
 
-        if not row.is_mounted:
-            # Mount
-            logger.info(f"Mounting device: {device.udid}")
+        if success:
+            item.is_mounted = True
+            item.mount_point = mount_point
+            item.changed()
+            self._update_mount_all_button()
+            if batch:
+                return False
 
-            success, mount_point, error_msg = self.mount_manager.mount_device(device)
+            self._show_banner_message(_("{} mounted successfully").format(device_name))
 
-            if success:
-                row.is_mounted = True
-                row.mount_point = mount_point
-                row.mount_button.set_label(_("Unmount"))
-                self._show_banner_message(_("{} mounted successfully").format(device_name))
+            if self.success_detail_label:
+                mounted_text = _("{} is mounted. You can now access it.")
+                self.success_detail_label.set_text(
+                    mounted_text.format(device_name))
 
-                if self.success_detail_label:
-                    mounted_text = _("{} is mounted. You can now access it.")
-                    self.success_detail_label.set_text(
-                        mounted_text.format(device_name))
-
-                # Open file manager
-                self.mount_manager.open_file_manager(mount_point)
-            else:
-                error_msg = error_msg or "Unknown error"
+            # Open file manager
+            self.mount_manager.open_file_manager(mount_point)
+        else:
+            item.changed()
+            error_msg = error_msg or "Unknown error"
+            if not batch:
                 self._show_banner_message(_("Mount failed: {}").format(error_msg))
-                logger.error(f"Mount failed for {device.udid}: {error_msg}")
+            logger.error("Mount failed for %s: %s", device.udid, error_msg)
 
-        else:
-            # Unmount
-            logger.info(f"Unmounting device: {device.udid}")
+        return False
+
+    def _on_unmount_finished(self, item, device, success, error_msg, batch=False):
+        """
+        Shows the unmount result on the row.
+        Batch results only update the row, the summary goes to the banner.
+        """
+        device_name = device.name or _("Device")
+        item.is_busy = False
 
-            success, error_msg = self.mount_manager.unmount_device(row.mount_point)
+        if success:
+            item.is_mounted = False
+            item.mount_point = None
+            item.changed()
+            self._update_mount_all_button()
+            if batch:
+                return False
 
-            if success:
-                row.is_mounted = False
-                row.mount_point = None
-                row.mount_button.set_label(_("Mount"))
-                self._show_banner_message(_("{} unmounted successfully").format(device_name))
+            self._show_banner_message(_("{} unmounted successfully").format(device_name))
 
-                if self.success_detail_label:
-                    self.success_detail_label.set_text(_("Select a device to mount"))
-            else:
-                error_msg = error_msg or "Unknown error"
-                self._show_banner_message(_("Unmount failed: {}").format(error_msg))
-                logger.error(f"Unmount failed for {device.udid}: {error_msg}")
+            if self.success_detail_label:
+                self.success_detail_label.set_text(_("Select a device to mount"))
+        else:
+            item.changed()
+            error_msg = error_msg or "Unknown error"
+            if not batch:
+                self._show_banner_message(
+                    _("Unmount failed: {}").format(error_msg),
+                    show_wait=self.release_item is item
+                )
+            logger.error("Unmount failed for %s: %s", device.udid, error_msg)
 
-    def _on_row_details_clicked(self, widget, device):
+        return False
+
+    def _on_row_details_clicked(self, item):
         """
         Row details button clicked
         """
-        logger.info(f"Details clicked for device: {device.udid}")
+        device = item.device
+        logger.info("Details clicked for device: %s", device.udid)
+
+        device_details_dialog = self.get_device_details_dialog()
+
+        # Populate device information to dialog, storage and battery
+        # are filled in as they arrive
+        self.details_device = device
+        self._get_device_details(device, loading=True)
 
-        # Populate device information to dialog
-        self._get_device_details(device)
+        mount_point = item.mount_point if item.is_mounted else None
+        thread = threading.Thread(
+            target=self._details_thread, args=(device, mount_point), daemon=True
+        )
+        thread.start()
+
+        # Battery and storage are refreshed while the dialog is open
+        self.details_monitor = self._create_details_monitor(device, mount_point)
+        self.details_monitor.start()
 
         # Show dialog
-        self.device_details_dialog.run()
-        self.device_details_dialog.hide()
+        device_details_dialog.run()
+        device_details_dialog.hide()
+        self.details_monitor.stop()
+        self.details_monitor = None
+        self.details_device = None
 
     def _on_details_dialog_close(self, widget):
 
         self.device_details_dialog.hide()
 
-    def _get_device_details(self, device):
+    def _create_details_monitor(self, device, mount_point):
+        """
+        Live monitor of the dialog, a mounted device reports its
+        capacity through the mount point.
+        """
+        read_storage = None
+        if mount_point:
+            read_storage = lambda: self.mount_manager.get_storage(mount_point)
+
+        return DeviceMonitor(
+            self.device_manager,
+            device.udid,
+            on_sample=lambda domain, data: GLib.idle_add(
+                self._on_details_domain, device, domain, data),
+            read_storage=read_storage,
+            on_storage=lambda total, available: GLib.idle_add(
+                self._on_details_storage, device, total, available)
+        )
+
+    def _details_thread(self, device, mount_point):
+        """
+        Runs in a separate thread, fetches the extended details.
+        Capacity of a mounted device comes from the mount itself.
+        """
+        domains = EXTENDED_DOMAINS
+        if mount_point:
+            storage = self.mount_manager.get_storage(mount_point)
+            if storage:
+                GLib.idle_add(self._on_details_storage, device, *storage)
+                domains = (BATTERY_DOMAIN,)
+
+        try:
+            self.device_manager.fetch_extended_info(
+                device.udid, domains,
+                on_domain=lambda domain, data: GLib.idle_add(
+                    self._on_details_domain, device, domain, data)
+            )
+        except Exception as e:
+            logger.error("Details error for %s: %s", device.udid, e)
+        GLib.idle_add(self._on_details_loaded, device)
+
+    def _on_details_storage(self, device, total_bytes, available_bytes):
+        """
+        Shows the free space read from the mount point.
+        The mount only sees the data partition, the capacity stays the
+        TotalDiskCapacity of the scan that the list row shows as well.
+        """
+        device.storage_available = available_bytes / (1000**3)
+        capacity = device.storage_total or total_bytes / (1000**3)
+        device.storage_used = capacity - device.storage_available
+        if self.details_device is device:
+            self._get_device_details(device, loading=True)
+        return False
+
+    def _on_details_domain(self, device, domain, data):
+        """
+        Fills in an extended domain as soon as it arrives.
+        """
+        storage_total = device.storage_total
+        apply_domain(device, domain, data)
+        if device.storage_total != storage_total:
+            # Capacity is shown in the list row too
+            item = self.device_items.get(device.udid)
+            if item and item.device is device:
+                item.changed()
+        if self.details_device is device:
+            self._get_device_details(device, loading=True)
+        return False
+
+    def _on_details_loaded(self, device):
+        """
+        Replaces placeholders of values that could not be fetched.
+        """
+        if self.details_device is device:
+            self._get_device_details(device)
+        return False
+
+    def _get_device_details(self, device, loading=False):
         """
         Populate device details dialog with device infos
+        Missing storage and battery values show a placeholder while loading.
         """
+        missing = _("Loading…") if loading else "—"
+
         # Header
         device_name_label = self.builder.get_object("device_name_label")
         if device_name_label:
@@ -378,7 +873,7 @@ class MainWindow(Gtk.Window):
         detail_storage_used = self.builder.get_object("detail_storage_used")
         if detail_storage_used:
             text = (f"{device.storage_used:.2f} GB"
-                    if device.storage_used else "—")
+                    if device.storage_used else missing)
             detail_storage_used.set_text(text)
 
         detail_storage_available = self.builder.get_object(
@@ -386,7 +881,7 @@ class MainWindow(Gtk.Window):
         )
         if detail_storage_available:
             text = (f"{device.storage_available:.2f} GB"
-                    if device.storage_available else "—")
+                    if device.storage_available else missing)
             detail_storage_available.set_text(text)
 
         # Battery section
@@ -395,14 +890,14 @@ class MainWindow(Gtk.Window):
         )
         if detail_battery_level:
             text = (f"{device.battery_level}%"
-                    if device.battery_level is not None else "—")
+                    if device.battery_level is not None else missing)
             detail_battery_level.set_text(text)
 
         detail_battery_state = self.builder.get_object(
             "detail_battery_state"
         )
         if detail_battery_state:
-            detail_battery_state.set_text(device.battery_state or "—")
+            detail_battery_state.set_text(device.battery_state or missing)
 
         # Network section
         detail_wifi_mac = self.builder.get_object("detail_wifi_mac")
@@ -413,33 +908,56 @@ class MainWindow(Gtk.Window):
         if detail_bluetooth_mac:
             detail_bluetooth_mac.set_text(device.bluetooth_mac or "—")
 
-    def _scan_devices_thread(self):
+    def _add_device_row(self, device, verified=True):
         """
-        This function runs in a separate thread to avoid ui freezing.
+        Adds a row for a device as soon as its scan finishes.
+        An already listed device gets its item updated in place.
         """
-        try:
-            devices = self.device_manager.refresh_devices()
-            GLib.idle_add(self._update_ui_with_devices, devices)
+        item = self.device_items.get(device.udid)
+        if item:
+            item.device = device
+            item.is_verified = verified
+            item.changed()
+        else:
+            item = DeviceItem(device, verified)
+            self.device_items[device.udid] = item
+            self.device_store.append(item)
 
-        except Exception as e:
-            logger.error(f"Device scan error in thread: {e}")
-            GLib.idle_add(self._handle_scan_error, e)
+        if verified and not device.is_trusted:
+            self._schedule_trust_check()
+
+        self._update_mount_all_button()
+
+        if self.status_stack:
+            self.status_stack.set_visible_child_name("success")
+
+        return False
+
+    def _remove_device_item(self, udid):
+        """
+        Removes the item (and so the row) of a device.
+        Returns the removed item or None.
+        """
+        item = self.device_items.pop(udid, None)
+        if item:
+            found, position = self.device_store.find(item)
+            if found:
+                self.device_store.remove(position)
+        return item
 
     def _update_ui_with_devices(self, devices):
         """
-        Updates UI with scanned devices.
+        Updates UI after the scan has finished.
+        Rows are already added by _add_device_row.
         """
         try:
-            logger.info(f"Device scan completed - Found {len(devices)} devices")
+            logger.info("Device scan completed - Found %s devices", len(devices))
+
+            self._reconcile_rows(devices)
 
-            # Del old rows
-            for child in self.list_box.get_children():
-                self.list_box.remove(child)
+            save_snapshot(devices)
 
             if devices:
-                for device in devices:
-                    row = self._create_device_row(device)
-                    self.list_box.add(row)
                 self._show_banner_message(_("{} device(s) found").format(len(devices)))
 
                 if self.status_stack:
@@ -455,10 +973,158 @@ class MainWindow(Gtk.Window):
                 if self.status_stack:
                     self.status_stack.set_visible_child_name("empty")
         except Exception as e:
-            logger.error(f"Error updating UI: {e}")
+            logger.error("Error updating UI: %s", e)
             self._handle_scan_error(e)
         finally:
-            self.is_scanning = False
+            self._finish_scan()
+
+        return False
+
+    def _reconcile_rows(self, devices):
+        """
+        Diffs listed items against scanned devices by UDID.
+        Only items of removed or new devices are removed or inserted,
+        existing items are updated in place.
+        """
+        found = set()
+        for device in devices:
+            found.add(device.udid)
+            self._add_device_row(device)
+
+        # Drop items of devices that are not connected anymore
+        for udid in [udid for udid in self.device_items if udid not in found]:
+            self._remove_device_item(udid)
+
+        self._update_mount_all_button()
+
+    def _finish_scan(self):
+        """
+        Clears the scanning flag and runs a scan requested meanwhile.
+        """
+        self.is_scanning = False
+
+        # Devices attached after the scan listed the connected ones
+        scan = self.current_scan
+        self.current_scan = None
+        missed = [
+            udid for udid in self.attached_during_scan
+            if scan is None or udid not in (scan.udids or ())
+        ]
+        self.attached_during_scan.clear()
+
+        if self.rescan_pending:
+            self.rescan_pending = False
+            self.on_scan_button_clicked(None)
+        for udid in missed:
+            self._on_device_attached(udid)
+
+    def _on_device_attached(self, udid):
+        """
+        Queries a newly attached device on the main loop, unless the
+        running scan does. usbmuxd reports every connected device as
+        attached when the listener subscribes, while the startup scan
+        is running.
+        """
+        if self.current_scan and self.current_scan.covers(udid):
+            logger.debug("%s is queried by the running scan", udid)
+            self.attached_during_scan.add(udid)
+            return False
+        return self._query_device(udid)
+
+    def _query_device(self, udid):
+        """
+        Queries one device on the main loop, e.g. after it was paired.
+        """
+        logger.info("Getting device info for UDID: %s", udid)
+        try:
+            AsyncScan(
+                self.device_manager, on_device=self._add_device_row, udids=[udid]
+            ).start()
+        except Exception as e:
+            logger.error("Device info error for %s: %s", udid, e)
+        return False
+
+    def _on_device_detached(self, udid):
+        """
+        Removes the row of a detached device.
+        """
+        self.attached_during_scan.discard(udid)
+        self.device_manager.forget(udid)
+        self.mount_manager.cancel_device(udid)
+
+        item = self._remove_device_item(udid)
+        if item:
+            # ifuse needs a moment to notice the unplug
+            if item.is_mounted:
+                GLib.timeout_add(1000, self._start_endpoint_check)
+
+            self._update_mount_all_button()
+
+        if not self.device_items and not self.is_scanning:
+            if self.status_stack:
+                self.status_stack.set_visible_child_name("empty")
+
+        return False
+
+    def _start_endpoint_check(self):
+        """
+        Has the mount watcher thread look for dead mount endpoints.
+        """
+        self.mount_watcher.request_check()
+        return False
+
+    def _on_external_unmount(self, mount_point):
+        """
+        Updates the row of a device that was unmounted outside the app
+        (file manager, unplugged cable).
+        """
+        for item in self.device_items.values():
+            if item.is_busy or item.mount_point != mount_point:
+                continue
+
+            item.is_mounted = False
+            item.mount_point = None
+            item.changed()
+
+            device_name = item.device.name or _("Device")
+            self._show_banner_message(_("{} was unmounted").format(device_name))
+            self._update_mount_all_button()
+
+        return False
+
+    def _on_mount_lost(self, mount_point, error):
+        """
+        Updates the row of a device whose ifuse process exited.
+        """
+        logger.warning("Mount %s lost: %s", mount_point, error)
+        for item in self.device_items.values():
+            if item.mount_point != mount_point:
+                continue
+
+            item.is_mounted = False
+            item.mount_point = None
+            item.changed()
+
+            device_name = item.device.name or _("Device")
+            self._show_banner_message(
+                _("{} connection lost, remounting…").format(device_name))
+            self._update_mount_all_button()
+
+        return False
+
+    def _on_remounted(self, udid, mount_point):
+        """
+        Updates the row of a device that was mounted again after a crash.
+        """
+        item = self.device_items.get(udid)
+        if item and not item.is_busy:
+            item.is_mounted = True
+            item.mount_point = mount_point
+            item.changed()
+
+            device_name = item.device.name or _("Device")
+            self._show_banner_message(_("{} mounted again").format(device_name))
+            self._update_mount_all_button()
 
         return False
 
@@ -466,26 +1132,34 @@ class MainWindow(Gtk.Window):
         """
         Handles scan errors in the UI.
         """
-        logger.error(f"Device scan error: {error}")
+        logger.error("Device scan error: %s", error)
         self._show_banner_message(_("Scan error. Install required tools."))
 
         if self.status_stack:
             self.status_stack.set_visible_child_name("error")
 
-        self.is_scanning = False
+        self._finish_scan()
         return False
 
-    def _show_banner_message(self, message):
+    def _show_banner_message(self, message, show_wait=False):
         """
         Show a message in the banner.
+        show_wait shows the button that unmounts release_item once its
+        files are closed.
         """
         banner_label = self.builder.get_object("banner_label")
         banner_revealer = self.builder.get_object("banner_revealer")
 
+        banner_wait_button = self.builder.get_object("banner_wait_button")
+        if banner_wait_button:
+            banner_wait_button.set_visible(show_wait)
+        if not show_wait:
+            self.release_item = None
+
         if banner_label and banner_revealer:
             banner_label.set_text(message)
             banner_revealer.set_reveal_child(True)
-            logger.debug(f"Banner message: {message}")
+            logger.debug("Banner message: %s", message)
 
     def _resize_window_after_banner(self):
         """
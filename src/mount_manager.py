@@ -2,26 +2,228 @@
 """
 Mount manager for device mounting and unmounting operations.
 """
+import ctypes
+import signal
 import subprocess
 import os
 import re
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from command_runner import CancelToken, Cancelled, Deadline, kill_group, run_command, track
 from logger_config import get_logger
+from mount_table import (
+    DEAD_ENDPOINT_ERRORS, ENDPOINT_DEAD, ENDPOINT_OK, MountTable, probe_endpoints
+)
+from open_files import describe_holders, find_holders
 
 logger = get_logger('mount_manager')
 
+# Parallel fusermount calls during stale mount cleanup
+CLEANUP_WORKERS = 4
+
+# Parallel ifuse/fusermount calls of mount_all/unmount_all
+BATCH_JOBS = 4
+
+# Flush of a single mount before unmount (seconds)
+FLUSH_TIMEOUT = 30
+FLUSH_PROGRESS_INTERVAL = 0.25
+
+# FUSE requests of a mount still waiting for ifuse, readable by the
+# mount owner (fusectl, named by the kernel dev_t of the mount)
+FUSE_WAITING = '/sys/fs/fuse/connections/{}/waiting'
+
+# Per backing device writeback counters, only readable if debugfs is
+BDI_STATS = '/sys/kernel/debug/bdi/{}/stats'
+
+# Remaining work of a flush, fields are None if not readable
+FlushProgress = namedtuple('FlushProgress', ['dirty_bytes', 'waiting_requests'])
+
+# Supervised (ifuse -f) mounts
+MOUNT_TIMEOUT = 15
+MOUNT_POLL_INTERVAL = 0.05
+TERMINATE_TIMEOUT = 3
+STDERR_LINES = 20
+
+# Graceful and forced fusermount together (seconds)
+UNMOUNT_TIMEOUT = 15
+
+# Waiting for processes to release a busy mount (seconds)
+RELEASE_TIMEOUT = 60
+RELEASE_POLL_INTERVAL = 0.5
+
+# Remount attempts after an ifuse crash, the delay doubles per attempt
+REMOUNT_ATTEMPTS = 3
+REMOUNT_BACKOFF = 1
+
+_libc = None
+
+
+def _syncfs(fd):
+    """
+    Call syncfs(2), os module has no wrapper for it.
+    """
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(None, use_errno=True)
+    if _libc.syncfs(fd) != 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+
+
+def get_dirty_bytes(device):
+    """
+    Return dirty + writeback bytes of a backing device ("major:minor").
+    Returns None if the counters are not readable.
+    """
+    try:
+        with open(BDI_STATS.format(device), 'r') as f:
+            stats = f.read()
+    except OSError:
+        return None
+
+    dirty_kb = 0
+    for line in stats.splitlines():
+        key, _, value = line.partition(':')
+        if key.strip() in ('BdiWriteback', 'BdiReclaimable'):
+            try:
+                dirty_kb += int(value.split()[0])
+            except (ValueError, IndexError):
+                return None
+    return dirty_kb * 1024
+
+
+def get_waiting_requests(device):
+    """
+    Return the FUSE requests of a mount ("major:minor") that ifuse has
+    not answered yet, writes included.
+    Returns None if fusectl is not mounted.
+    """
+    major, _, minor = device.partition(':')
+    try:
+        connection = (int(major) << 20) | int(minor)
+        with open(FUSE_WAITING.format(connection), 'r') as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def get_flush_progress(device):
+    return FlushProgress(get_dirty_bytes(device), get_waiting_requests(device))
+
+
+def _is_busy(result):
+    return "busy" in (result.stderr or "").lower()
+
+
+def _busy_message(holders):
+    if not holders:
+        return "Device is busy. Close all files and try again."
+    return f"Device is busy, in use by {describe_holders(holders)}. Close them and try again."
+
+
+class SupervisedMount:
+    """
+    ifuse process running in foreground mode for one mount point.
+    It leads its own process group, so it can be signalled as a whole.
+    """
+
+    def __init__(self, device, mount_point, process):
+        self.device = device
+        self.mount_point = mount_point
+        self.process = process
+        self.stderr_tail = deque(maxlen=STDERR_LINES)
+        # Set once the mount shows up in the mount table
+        self.mounted = False
+        # Set when we stop it ourselves, an exit is then not a crash
+        self.stopping = False
+        self.exited = threading.Event()
+
+    def error_text(self):
+        return '\n'.join(self.stderr_tail).strip()
+
+    def signal(self, signum):
+        kill_group(self.process, signum)
+
+    def terminate(self, timeout=TERMINATE_TIMEOUT):
+        """
+        SIGTERM the process group, SIGKILL if it does not exit in time.
+        """
+        self.stopping = True
+        self.signal(signal.SIGTERM)
+        if not self.exited.wait(timeout):
+            logger.warning("ifuse for %s did not exit, killing", self.mount_point)
+            self.signal(signal.SIGKILL)
+            self.exited.wait(timeout)
+
 
 class MountManager:
-    def __init__(self):
-        self.mount_base_dir = Path(f"/run/user/{os.getuid()}/idevices")
+    def __init__(self, base_dir=None, supervise=True, auto_remount=False,
+                 on_mount_lost=None, on_remounted=None):
+        """
+        With supervise=True ifuse runs in foreground mode as a child,
+        a crash is noticed right away, the mount point is cleaned up and
+        on_mount_lost(mount_point, error) is called. With auto_remount
+        the device is mounted again and on_remounted(device, mount_point)
+        is called. Callbacks run in the supervisor thread.
+        supervise=False lets ifuse daemonize, mounts then outlive the
+        process (command line use).
+        """
+        self.mount_base_dir = Path(base_dir or f"/run/user/{os.getuid()}/idevices")
         self.mount_base_dir.mkdir(parents=True, exist_ok=True)
-        logger.info(f"Mount base directory: {self.mount_base_dir}")
+        self.mount_table = MountTable(self.mount_base_dir)
+        logger.info("Mount base directory: %s", self.mount_base_dir)
+
+        self.supervise = supervise
+        self.auto_remount = auto_remount
+        self.on_mount_lost = on_mount_lost
+        self.on_remounted = on_remounted
+
+        # Supervised mounts by mount point
+        self.supervised = {}
+        self.lock = threading.Lock()
+
+        # Cancelled on close(), per device children on cancel_device()
+        self.token = CancelToken()
+        self.device_tokens = {}
+
+    def close(self):
+        """
+        Stops supervision and kills mounts still starting up.
+        Established mounts are left in place and ifuse keeps running.
+        """
+        with self.lock:
+            for supervised in self.supervised.values():
+                supervised.stopping = True
+        self.token.cancel()
+
+    def cancel_device(self, udid):
+        """
+        Stops a running mount and remount attempts of a device
+        (e.g. it was unplugged).
+        """
+        with self.lock:
+            token = self.device_tokens.pop(udid, None)
+        if token:
+            token.cancel()
+
+    def _device_token(self, udid):
+        with self.lock:
+            token = self.device_tokens.get(udid)
+            if token is None:
+                token = self.device_tokens[udid] = CancelToken(self.token)
+            return token
 
     def mount_device(self, device):
         """
         Mount device using ifuse.
         Returns success status, mount point
         """
+        return self._mount(device, self._device_token(device.udid))
+
+    def _mount(self, device, token):
         try:
             device_name = device.name if device.name else "Device"
 
@@ -35,15 +237,24 @@ class MountManager:
             device_name = f"{device_name}_{device.udid}"
             mount_point = self.mount_base_dir / device_name
 
-            # Check if mount point exists
-            if mount_point.exists():
-                if self.is_mounted(str(mount_point)):
+            # A listed mount may belong to an ifuse that died (e.g. a
+            # daemonized command line mount), check it answers first
+            if self.is_mounted(str(mount_point)):
+                state = probe_endpoints([str(mount_point)])[str(mount_point)]
+                if state == ENDPOINT_OK:
                     logger.info("Device already mounted at: %s", mount_point)
                     return True, str(mount_point), None
+                if state != ENDPOINT_DEAD:
+                    return False, None, "Existing mount does not respond"
 
-                # Directory exists but not mounted (stale mount)
-                logger.warning("Stale mount detected, cleaning up: %s", mount_point)
-                self.unmount_device(str(mount_point), force=True)
+                logger.warning("Dead mount endpoint, mounting again: %s", mount_point)
+                self.cleanup_dead_mount(mount_point)
+
+            # Check if mount point exists
+            if mount_point.exists():
+                # Directory exists but not mounted, mount table says there
+                # is nothing to unmount so only remove the directory
+                logger.warning("Stale mount point detected, cleaning up: %s", mount_point)
 
                 try:
                     mount_point.rmdir()
@@ -54,19 +265,26 @@ class MountManager:
 
             # Create mount point
             mount_point.mkdir(parents=True, exist_ok=True)
-            logger.info(f"Mounting {device_name}")
+            logger.info("Mounting %s", device_name)
 
             # Mount using ifuse
-            result = subprocess.run(
-                ['ifuse', '-u', device.udid, str(mount_point)],
-                capture_output=True,
-                text=True,
-                timeout=15,
-                check=False
-            )
+            if self.supervise:
+                success, error_msg = self._start_supervised(device, mount_point, token)
+            else:
+                result = run_command(
+                    ['ifuse', '-u', device.udid, str(mount_point)],
+                    timeout=MOUNT_TIMEOUT,
+                    udid=device.udid,
+                    label='mount',
+                    token=token,
+                    capture_output=True,
+                    text=True
+                )
+                success = result.returncode == 0
+                error_msg = result.stderr.strip() if result.stderr else None
 
-            if result.returncode == 0:
-                logger.info(f"Mount successful: {device_name}")
+            if success:
+                logger.info("Mount successful: %s", device_name)
                 return True, str(mount_point), None
             else:
                 try:
@@ -74,8 +292,8 @@ class MountManager:
                 except OSError:
                     pass
 
-                error_msg = result.stderr.strip() if result.stderr else "Mount failed"
-                logger.error(f"Mount failed: {error_msg}")
+                error_msg = error_msg or "Mount failed"
+                logger.error("Mount failed: %s", error_msg)
                 return False, None, error_msg
 
         except FileNotFoundError:
@@ -86,59 +304,346 @@ class MountManager:
             error_msg = "Mount timed out"
             logger.error(error_msg)
             return False, None, error_msg
+        except Cancelled:
+            try:
+                mount_point.rmdir()
+            except OSError:
+                pass
+            logger.info("Mount of %s cancelled", device.udid)
+            return False, None, "Mount cancelled"
         except Exception as e:
             error_msg = f"Mount error: {e}"
             logger.error(error_msg)
             return False, None, error_msg
 
-    def unmount_device(self, mount_point, force=False):
+    def _start_supervised(self, device, mount_point, token):
+        """
+        Start ifuse in foreground mode and wait until the mount shows up
+        in the mount table or ifuse exits.
+        Raises Cancelled if token is cancelled meanwhile.
+        Returns success status, error message
+        """
+        mount_point = str(mount_point)
+        command = ['ifuse', '-f', '-u', device.udid, mount_point]
+
+        with track(command, MOUNT_TIMEOUT, device.udid, 'mount') as span:
+            # SIGPIPE stays ignored, so ifuse survives our exit even
+            # though its stderr pipe breaks
+            process = subprocess.Popen(
+                command,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                start_new_session=True,
+                restore_signals=False
+            )
+            supervised = SupervisedMount(device, mount_point, process)
+            threading.Thread(
+                target=self._supervise, args=(supervised,),
+                name=f'ifuse-{device.udid[:8]}', daemon=True
+            ).start()
+
+            deadline = time.monotonic() + MOUNT_TIMEOUT
+            while not supervised.exited.wait(MOUNT_POLL_INTERVAL):
+                self.mount_table.reload()
+                if self.mount_table.is_mounted(mount_point):
+                    with self.lock:
+                        if not supervised.exited.is_set():
+                            supervised.mounted = True
+                            self.supervised[mount_point] = supervised
+                    break
+
+                if token.cancelled:
+                    supervised.terminate()
+                    raise Cancelled()
+
+                if time.monotonic() > deadline:
+                    span.timed_out = True
+                    supervised.terminate()
+                    raise subprocess.TimeoutExpired(command, MOUNT_TIMEOUT)
+
+            if not supervised.mounted:
+                span.returncode = process.returncode
+                return False, supervised.error_text() or "ifuse exited before mounting"
+
+            span.returncode = 0
+            logger.info("ifuse for %s running as pid %d", mount_point, process.pid)
+            return True, None
+
+    def _supervise(self, supervised):
+        """
+        Runs in a thread per ifuse process, collects its stderr and
+        handles its exit.
+        """
+        process = supervised.process
+        for line in process.stderr:
+            line = line.rstrip()
+            if line:
+                supervised.stderr_tail.append(line)
+                logger.debug("ifuse %s: %s", supervised.mount_point, line)
+        process.stderr.close()
+        returncode = process.wait()
+
+        with self.lock:
+            supervised.exited.set()
+            crashed = supervised.mounted and not supervised.stopping
+            if self.supervised.get(supervised.mount_point) is supervised:
+                del self.supervised[supervised.mount_point]
+
+        if not crashed:
+            return
+
+        # Unmounted from outside (file manager, fusermount -u), ifuse
+        # then exits cleanly and the mount is gone. The mount watcher
+        # reports it, this is not a crash.
+        if returncode == 0 or not self.is_mounted(supervised.mount_point):
+            logger.info(
+                "ifuse for %s exited after an external unmount (code %d)",
+                supervised.mount_point, returncode
+            )
+            return
+
+        self._handle_crash(supervised, returncode)
+
+    def _handle_crash(self, supervised, returncode):
+        """
+        Cleans up after an ifuse process that failed while mounted.
+        """
+        mount_point = supervised.mount_point
+        error_msg = supervised.error_text() or f"ifuse exited with code {returncode}"
+        logger.error("ifuse for %s exited unexpectedly: %s", mount_point, error_msg)
+
+        self.cleanup_dead_mount(mount_point)
+        if self.on_mount_lost:
+            self.on_mount_lost(mount_point, error_msg)
+
+        if self.auto_remount:
+            self._remount(supervised.device)
+
+    def _remount(self, device):
+        """
+        Mounts a device again with exponential backoff.
+        Nothing is done for a device that was unplugged meanwhile.
+        """
+        with self.lock:
+            token = self.device_tokens.get(device.udid)
+        if token is None or token.cancelled:
+            logger.info("Not remounting %s, device is gone", device.udid)
+            return
+
+        delay = REMOUNT_BACKOFF
+        for attempt in range(1, REMOUNT_ATTEMPTS + 1):
+            if token.wait(delay):
+                return
+
+            logger.info("Remounting %s (attempt %d)", device.udid, attempt)
+            success, mount_point, _error_msg = self._mount(device, token)
+            if success:
+                if self.on_remounted:
+                    self.on_remounted(device, mount_point)
+                return
+            delay *= 2
+
+        logger.error("Giving up remounting %s", device.udid)
+
+    def flush_mount(self, mount_point, on_progress=None, timeout=FLUSH_TIMEOUT):
+        """
+        Flush pending writes of a single mount with syncfs.
+        on_progress(FlushProgress) is called while waiting, with the
+        pending FUSE requests of the mount and, if debugfs is readable,
+        its dirty bytes.
+        Returns success status, error message and whether the mount is
+        unreachable (dead endpoint, or hung: a flush that timed out and
+        a stat that gets no answer either), so there is nothing to save
+        """
+        entry = self.mount_table.get(mount_point)
+        device = entry.device if entry else None
+
+        try:
+            fd = os.open(mount_point, os.O_RDONLY | os.O_DIRECTORY)
+        except OSError as e:
+            return False, f"Flush failed: {e.strerror}", e.errno in DEAD_ENDPOINT_ERRORS
+
+        done = threading.Event()
+        errors = []
+
+        def flush():
+            try:
+                _syncfs(fd)
+            except OSError as e:
+                errors.append(e)
+            finally:
+                os.close(fd)
+                done.set()
+
+        threading.Thread(target=flush, daemon=True).start()
+
+        deadline = time.monotonic() + timeout
+        while not done.wait(FLUSH_PROGRESS_INTERVAL):
+            if time.monotonic() > deadline:
+                # A slow flush (e.g. a large copy still in flight) of a
+                # mount that still answers is not a hung mount
+                state = probe_endpoints([mount_point])[mount_point]
+                logger.error("Flush of %s timed out, mount is %s", mount_point, state)
+                return False, "Flush timed out", state != ENDPOINT_OK
+            if on_progress:
+                on_progress(get_flush_progress(device) if device
+                            else FlushProgress(None, None))
+
+        if errors:
+            logger.error("Flush of %s failed: %s", mount_point, errors[0])
+            return (False, f"Flush failed: {errors[0].strerror}",
+                    errors[0].errno in DEAD_ENDPOINT_ERRORS)
+
+        if on_progress:
+            on_progress(FlushProgress(0, 0))
+        return True, None, False
+
+    def get_storage(self, mount_point):
+        """
+        Capacity of a mounted device from statvfs, avoids a lockdown query.
+        Returns total bytes, available bytes or None
+        """
+        try:
+            stat = os.statvfs(mount_point)
+        except OSError as e:
+            logger.warning("statvfs failed for %s: %s", mount_point, e)
+            return None
+        return stat.f_blocks * stat.f_frsize, stat.f_bavail * stat.f_frsize
+
+    def unmount_device(self, mount_point, force=False, on_progress=None,
+                       on_busy=None, wait_release=False):
         """
         Unmount device.
+        Pending writes of this mount are flushed first, unmount only
+        starts once the flush has finished (unless force=True).
+        A forced unmount of a supervised mount signals its ifuse process.
+        If the mount is busy on_busy(holders) gets the processes using it.
+        With wait_release=True the unmount waits until they let go (up to
+        RELEASE_TIMEOUT), on_busy is called again when the holders change.
         Returns success status, error message
         """
+        with self.lock:
+            supervised = self.supervised.get(str(mount_point))
+            if supervised:
+                supervised.stopping = True
+
+        success, error_msg = self._unmount(
+            mount_point, force, on_progress, supervised, on_busy, wait_release
+        )
+        if not success and supervised:
+            # Still mounted, a later exit is a crash again
+            supervised.stopping = False
+        return success, error_msg
+
+    def wait_for_release(self, mount_point, on_busy=None, holders=(),
+                         timeout=RELEASE_TIMEOUT):
+        """
+        Wait until no process uses the mount anymore.
+        Polls only for a first holder, the full list is gathered for
+        on_busy(holders) when a process other than the given holders
+        shows up.
+        Returns True once released, False on timeout or close().
+        """
+        deadline = Deadline(timeout)
+        reported = {holder.pid for holder in holders}
+        while not deadline.expired:
+            holders, _complete = find_holders(mount_point, limit=1)
+            if not holders:
+                return True
+
+            if on_busy and holders[0].pid not in reported:
+                holders, _complete = find_holders(mount_point)
+                reported = {holder.pid for holder in holders}
+                on_busy(holders)
+
+            if self.token.wait(min(RELEASE_POLL_INTERVAL, deadline.remaining())):
+                return False
+        return False
+
+    def _unmount(self, mount_point, force, on_progress, supervised,
+                 on_busy=None, wait_release=False):
         try:
-            logger.info(f"Unmounting {Path(mount_point).name}")
+            logger.info("Unmounting %s", Path(mount_point).name)
 
             # Sync pending writes to device
-            try:
-                subprocess.run(['sync'], timeout=5, check=False)
-            except Exception:
-                pass
+            self.mount_table.reload()
+            success, error_msg, unreachable = self.flush_mount(str(mount_point), on_progress)
+            if not success and not force and not unreachable:
+                return False, error_msg
 
-            # Try graceful unmount first
-            result = subprocess.run(
-                ['fusermount', '-u', str(mount_point)],
-                capture_output=True,
-                text=True,
-                timeout=15,
-                check=False
-            )
+            deadline = Deadline(UNMOUNT_TIMEOUT)
+            if unreachable:
+                # Nothing can be saved, and a graceful unmount could hang
+                # on the mount as well: detach it
+                logger.warning("%s is not responding (%s), detaching it",
+                               mount_point, error_msg)
+                force = True
+                result = subprocess.CompletedProcess([], 1, '', '')
+            else:
+                # Try graceful unmount first
+                result = self._graceful_unmount(mount_point, deadline)
+
+            if result.returncode != 0 and not force and _is_busy(result):
+                holders, _complete = find_holders(mount_point)
+                logger.warning(
+                    "%s is busy, used by: %s",
+                    mount_point, describe_holders(holders) or "unknown"
+                )
+                if on_busy:
+                    on_busy(holders)
+
+                if not wait_release:
+                    return False, _busy_message(holders)
+                if not self.wait_for_release(mount_point, on_busy, holders):
+                    return False, "Device is still busy. Close all files and try again."
+
+                logger.info("%s released, unmounting", mount_point)
+                deadline = Deadline(UNMOUNT_TIMEOUT)
+                result = self._graceful_unmount(mount_point, deadline)
 
             if result.returncode == 0:
                 logger.info("Unmount successful (graceful)")
+                if supervised:
+                    # ifuse exits once its mount is gone
+                    supervised.exited.wait(TERMINATE_TIMEOUT)
                 try:
                     Path(mount_point).rmdir()
                 except OSError:
                     pass
                 return True, None
 
-            # Graceful failed - check if busy (unless force=True)
-            if not force:
-                error_msg = result.stderr.strip() if result.stderr else "Unmount failed"
-
-                # Check if device is busy
-                if "busy" in error_msg.lower() or "target is busy" in error_msg.lower():
-                    logger.warning(f"Device is busy: {error_msg}")
-                    return False, "Device is busy. Close all files and try again."
+            # Graceful failed - busy again after the release (unless force=True)
+            if _is_busy(result):
+                holders, _complete = find_holders(mount_point)
+                if not force:
+                    return False, _busy_message(holders)
+                logger.warning(
+                    "Forcing busy %s, open files of %s may lose writes",
+                    mount_point, describe_holders(holders) or "unknown processes"
+                )
 
             # Force unmount
             logger.warning("Graceful unmount failed, forcing...")
-            result = subprocess.run(
+            if supervised:
+                # Our own ifuse unmounts (lazily) when it is terminated
+                supervised.terminate()
+                if not self.is_mounted(str(mount_point)):
+                    logger.info("Unmount successful (ifuse terminated)")
+                    try:
+                        Path(mount_point).rmdir()
+                    except OSError:
+                        pass
+                    return True, None
+
+            result = run_command(
                 ['fusermount', '-uz', str(mount_point)],
+                timeout=UNMOUNT_TIMEOUT,
+                deadline=deadline,
+                label='force-unmount',
                 capture_output=True,
-                text=True,
-                timeout=15,
-                check=False
+                text=True
             )
 
             if result.returncode == 0:
@@ -150,7 +655,7 @@ class MountManager:
                 return True, None
             else:
                 error_msg = result.stderr.strip() if result.stderr else "Unmount failed"
-                logger.error(f"Force unmount failed: {error_msg}")
+                logger.error("Force unmount failed: %s", error_msg)
                 return False, error_msg
 
         except FileNotFoundError:
@@ -158,9 +663,108 @@ class MountManager:
         except subprocess.TimeoutExpired:
             return False, "Unmount timed out"
         except Exception as e:
-            logger.error(f"Unmount error: {e}")
+            logger.error("Unmount error: %s", e)
             return False, str(e)
 
+    def _graceful_unmount(self, mount_point, deadline):
+        return run_command(
+            ['fusermount', '-u', str(mount_point)],
+            timeout=UNMOUNT_TIMEOUT,
+            deadline=deadline,
+            label='unmount',
+            capture_output=True,
+            text=True
+        )
+
+    def mount_all(self, devices, max_jobs=BATCH_JOBS, open_file_manager=False,
+                  on_result=None):
+        """
+        Mount devices in parallel, at most max_jobs at a time.
+        Untrusted devices are skipped. on_result(device, result) is
+        called from the worker thread as each device finishes.
+        Returns per-device results, summary
+        """
+        def mount_one(device):
+            if not device.is_trusted:
+                result = {
+                    'udid': device.udid,
+                    'success': False,
+                    'skipped': True,
+                    'error': "Device is not trusted",
+                }
+            else:
+                start = time.monotonic()
+                success, mount_point, error_msg = self.mount_device(device)
+                result = {
+                    'udid': device.udid,
+                    'success': success,
+                    'mount_point': mount_point,
+                    'error': error_msg,
+                    'duration_ms': round((time.monotonic() - start) * 1000, 1),
+                }
+                if success and open_file_manager:
+                    self.open_file_manager(mount_point)
+
+            if on_result:
+                on_result(device, result)
+            return result
+
+        return self._run_batch(mount_one, devices, max_jobs)
+
+    def unmount_all(self, mount_points=None, max_jobs=BATCH_JOBS, on_result=None,
+                    wait_release=False):
+        """
+        Unmount mount points in parallel, at most max_jobs at a time.
+        All mounts under the base directory are used if mount_points is None.
+        on_result(mount_point, result) is called as each mount finishes.
+        With wait_release=True busy mounts wait until their files are closed.
+        Returns per-mount results, summary
+        """
+        if mount_points is None:
+            mount_points = list(self.mount_table.reload())
+
+        def unmount_one(mount_point):
+            start = time.monotonic()
+            success, error_msg = self.unmount_device(
+                mount_point, wait_release=wait_release)
+            result = {
+                'mount_point': mount_point,
+                'success': success,
+                'error': error_msg,
+                'duration_ms': round((time.monotonic() - start) * 1000, 1),
+            }
+            if on_result:
+                on_result(mount_point, result)
+            return result
+
+        return self._run_batch(unmount_one, mount_points, max_jobs)
+
+    def _run_batch(self, func, items, max_jobs):
+        """
+        Runs func for each item on a bounded pool.
+        Returns results in item order, summary
+        """
+        items = list(items)
+        start = time.monotonic()
+        results = []
+        if items:
+            workers = max(1, min(max_jobs, len(items)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(func, items))
+
+        skipped = sum(1 for result in results if result.get('skipped'))
+        succeeded = sum(1 for result in results if result['success'])
+        summary = {
+            'total': len(results),
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded - skipped,
+            'skipped': skipped,
+            'duration_ms': round((time.monotonic() - start) * 1000, 1),
+        }
+        logger.info("Batch finished: %d/%d succeeded, %d failed, %d skipped",
+                    succeeded, len(results), summary['failed'], skipped)
+        return results, summary
+
     def open_file_manager(self, path):
         """
         Open file manager using xdg-open
@@ -170,30 +774,35 @@ class MountManager:
             logger.info("File manager opened")
             return True
         except Exception as e:
-            logger.error(f"Failed to open file manager: {e}")
+            logger.error("Failed to open file manager: %s", e)
             return False
 
     def is_mounted(self, mount_point):
         """
         Check if mount point is currently mounted
         """
-        try:
-            result = subprocess.run(
-                ['mountpoint', '-q', mount_point],
-                timeout=5,
-                check=False
-            )
-            return result.returncode == 0
-        except OSError:
-            return False
+        self.mount_table.reload()
+        return self.mount_table.is_mounted(mount_point)
 
     def cleanup_stale_mounts(self):
         """
-        Unmount any stale mounts from previous sessions.
+        Unmount stale mounts left behind by previous sessions.
+        Only ifuse mounts with a dead endpoint are unmounted (in
+        parallel), working ones (e.g. made by the command line) are kept.
+        Leftover directories are just removed.
         """
         if not self.mount_base_dir.exists():
             return
 
+        states = probe_endpoints(list(self.mount_table.reload()))
+        stale_mounts = [
+            mount_point for mount_point, state in states.items()
+            if state == ENDPOINT_DEAD
+        ]
+        if stale_mounts:
+            with ThreadPoolExecutor(max_workers=CLEANUP_WORKERS) as executor:
+                list(executor.map(self._unmount_stale, stale_mounts))
+
         try:
             # Use os.listdir instead of iterdir to avoid stat calls
             mount_dirs = os.listdir(self.mount_base_dir)
@@ -201,26 +810,41 @@ class MountManager:
             return
 
         for mount_name in mount_dirs:
-            mount_path = self.mount_base_dir / mount_name
-
             try:
-                result = subprocess.run(
-                    ['fusermount', '-uz', str(mount_path)],
-                    timeout=1,
-                    capture_output=True,
-                    check=False
-                )
+                os.rmdir(self.mount_base_dir / mount_name)
+                logger.debug("Removed mount directory: %s", mount_name)
+            except OSError:
+                pass
 
-                if result.returncode == 0:
-                    logger.info(f"Unmounted stale mount: {mount_name}")
+    def cleanup_dead_mount(self, mount_point):
+        """
+        Remove a mount whose ifuse process is gone
+        ("Transport endpoint is not connected").
+        """
+        self._unmount_stale(str(mount_point))
+        try:
+            os.rmdir(mount_point)
+        except OSError:
+            pass
+        self.mount_table.reload()
 
-                try:
-                    os.rmdir(mount_path)
-                    logger.debug(f"Removed mount directory: {mount_name}")
-                except OSError:
-                    pass
+    def _unmount_stale(self, mount_path):
+        """
+        Lazily unmount one stale mount.
+        """
+        mount_name = Path(mount_path).name
+        try:
+            result = run_command(
+                ['fusermount', '-uz', mount_path],
+                timeout=1,
+                label='stale-unmount',
+                capture_output=True
+            )
 
-            except subprocess.TimeoutExpired:
-                logger.warning(f"Timeout unmounting {mount_name}")
-            except Exception as e:
-                logger.warning(f"Error cleaning up {mount_name}: {e}")
+            if result.returncode == 0:
+                logger.info("Unmounted stale mount: %s", mount_name)
+
+        except subprocess.TimeoutExpired:
+            logger.warning("Timeout unmounting %s", mount_name)
+        except Exception as e:
+            logger.warning("Error cleaning up %s: %s", mount_name, e)
@@ -0,0 +1,154 @@
+#!/usr/bin/python3
+"""
+Mount table index built from /proc/self/mountinfo.
+Answers mount point checks without spawning mountpoint/fusermount.
+"""
+
+import errno
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+from logger_config import get_logger
+
+logger = get_logger('mount_table')
+
+MOUNTINFO = '/proc/self/mountinfo'
+
+# device is the "major:minor" pair of the mount
+MountEntry = namedtuple('MountEntry', ['mount_point', 'fstype', 'source', 'device'])
+
+# Errors of a mount whose ifuse died or lost the device
+DEAD_ENDPOINT_ERRORS = (errno.ENOTCONN, errno.ECONNABORTED)
+
+# Endpoint probe results
+ENDPOINT_OK = 'ok'
+ENDPOINT_DEAD = 'dead'
+ENDPOINT_HUNG = 'hung'
+
+# Time a mount gets to answer a stat() probe (seconds)
+PROBE_TIMEOUT = 1
+
+# Mount points with a probe still stuck in stat()
+_pending_probes = set()
+_pending_lock = threading.Lock()
+
+_OCTAL_ESCAPE = re.compile(r'\\([0-7]{3})')
+
+
+def _unescape(field):
+    """
+    Decode octal escapes (\\040 for space etc.) used in mountinfo.
+    """
+    return _OCTAL_ESCAPE.sub(lambda match: chr(int(match.group(1), 8)), field)
+
+
+def is_ifuse_mount(fstype, source):
+    """
+    ifuse mounts show up as fuse.ifuse, or plain fuse with source ifuse.
+    """
+    return fstype == 'fuse.ifuse' or (fstype.startswith('fuse') and source == 'ifuse')
+
+
+def parse_mountinfo(text, base_dir):
+    """
+    Parse mountinfo content.
+    Returns {mount_point: MountEntry} of ifuse mounts under base_dir.
+    """
+    prefix = str(base_dir).rstrip('/') + '/'
+    entries = {}
+
+    for line in text.splitlines():
+        fields = line.split()
+        try:
+            separator = fields.index('-', 6)
+            mount_point = _unescape(fields[4])
+            fstype = fields[separator + 1]
+            source = _unescape(fields[separator + 2])
+        except (ValueError, IndexError):
+            continue
+
+        if not mount_point.startswith(prefix):
+            continue
+        if not is_ifuse_mount(fstype, source):
+            continue
+
+        entries[mount_point] = MountEntry(mount_point, fstype, source, fields[2])
+
+    return entries
+
+
+def probe_endpoints(mount_points, timeout=PROBE_TIMEOUT):
+    """
+    stat() each mount in a worker thread, a hung FUSE daemon blocks the
+    worker instead of the caller. A mount whose previous probe is still
+    stuck is not probed again.
+    Returns {mount_point: ENDPOINT_OK, ENDPOINT_DEAD or ENDPOINT_HUNG}
+    """
+    states = {}
+    probes = []
+
+    def probe(mount_point, done):
+        try:
+            os.stat(mount_point)
+        except OSError as e:
+            if e.errno in DEAD_ENDPOINT_ERRORS:
+                states[mount_point] = ENDPOINT_DEAD
+        finally:
+            with _pending_lock:
+                _pending_probes.discard(mount_point)
+            done.set()
+
+    for mount_point in mount_points:
+        with _pending_lock:
+            if mount_point in _pending_probes:
+                states[mount_point] = ENDPOINT_HUNG
+                continue
+            _pending_probes.add(mount_point)
+        done = threading.Event()
+        threading.Thread(
+            target=probe, args=(mount_point, done), name='mount-probe', daemon=True
+        ).start()
+        probes.append((mount_point, done))
+
+    deadline = time.monotonic() + timeout
+    for mount_point, done in probes:
+        if not done.wait(max(0, deadline - time.monotonic())):
+            logger.warning("Mount %s does not respond", mount_point)
+            states[mount_point] = ENDPOINT_HUNG
+        else:
+            states.setdefault(mount_point, ENDPOINT_OK)
+    return states
+
+
+class MountTable:
+    """
+    Index of ifuse mounts under the mount base directory.
+    """
+
+    def __init__(self, base_dir, path=MOUNTINFO):
+        self.base_dir = Path(base_dir)
+        self.path = path
+        self.entries = {}
+
+    def reload(self):
+        """
+        Re-read the mount table, returns the new index.
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8', errors='replace') as f:
+                text = f.read()
+        except OSError as e:
+            logger.warning("Could not read %s: %s", self.path, e)
+            return self.entries
+
+        self.entries = parse_mountinfo(text, self.base_dir)
+        return self.entries
+
+    def is_mounted(self, mount_point):
+        return str(Path(mount_point)) in self.entries
+
+    def get(self, mount_point):
+        return self.entries.get(str(Path(mount_point)))
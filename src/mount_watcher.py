@@ -0,0 +1,109 @@
+#!/usr/bin/python3
+"""
+Mount table watcher.
+Waits for /proc/self/mountinfo change notifications (POLLPRI) in a
+background thread and reports ifuse mounts that went away, including
+dead FUSE endpoints left behind by unplugged devices.
+"""
+
+import os
+import select
+import threading
+from logger_config import get_logger
+from mount_table import ENDPOINT_DEAD, probe_endpoints
+
+logger = get_logger('mount_watcher')
+
+
+class MountWatcher:
+    """
+    Calls on_unmounted(mount_point) from a background thread when a
+    mount under the base directory disappears or its endpoint is dead.
+    Blocks in poll() while nothing changes.
+    """
+
+    def __init__(self, mount_manager, on_unmounted):
+        self.mount_manager = mount_manager
+        self.mount_table = mount_manager.mount_table
+        self.on_unmounted = on_unmounted
+        self.thread = None
+        self.stopped = threading.Event()
+        self.wake_read, self.wake_write = os.pipe()
+        os.set_blocking(self.wake_write, False)
+
+    def start(self):
+        if self.thread:
+            return
+        self.thread = threading.Thread(target=self._run, name='mount-watcher', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self._wake()
+
+    def request_check(self):
+        """
+        Asks the watcher thread to look for dead endpoints, e.g. after a
+        device was detached. Does not block.
+        """
+        self._wake()
+
+    def _wake(self):
+        try:
+            os.write(self.wake_write, b'x')
+        except OSError:
+            pass
+
+    def _run(self):
+        try:
+            mountinfo = open(self.mount_table.path, 'r', encoding='utf-8', errors='replace')
+        except OSError as e:
+            logger.warning("Mount watcher disabled: %s", e)
+            return
+
+        with mountinfo:
+            poller = select.poll()
+            poller.register(mountinfo, select.POLLPRI | select.POLLERR)
+            poller.register(self.wake_read, select.POLLIN)
+
+            known = set(self.mount_table.reload())
+            while not self.stopped.is_set():
+                events = poller.poll()
+                if self.stopped.is_set():
+                    break
+
+                if any(fd == self.wake_read for fd, _event in events):
+                    os.read(self.wake_read, 4096)
+                    if not any(fd == mountinfo.fileno() for fd, _event in events):
+                        self.check_endpoints()
+                        continue
+
+                known = self._handle_change(known)
+
+        os.close(self.wake_read)
+        os.close(self.wake_write)
+
+    def _handle_change(self, known):
+        """
+        Report mounts that disappeared since the last change.
+        """
+        current = set(self.mount_table.reload())
+        for mount_point in known - current:
+            logger.info("Mount disappeared: %s", mount_point)
+            self.on_unmounted(mount_point)
+
+        self.check_endpoints()
+        return set(self.mount_table.entries)
+
+    def check_endpoints(self):
+        """
+        Find mounts whose FUSE daemon is gone and clean them up.
+        Runs in the watcher thread on mount table changes and on
+        request_check(), a hung mount delays it by PROBE_TIMEOUT at most.
+        """
+        states = probe_endpoints(list(self.mount_table.entries))
+        for mount_point, state in states.items():
+            if state == ENDPOINT_DEAD:
+                logger.warning("Dead mount endpoint: %s", mount_point)
+                self.mount_manager.cleanup_dead_mount(mount_point)
+                self.on_unmounted(mount_point)
@@ -0,0 +1,100 @@
+#!/usr/bin/python3
+"""
+Finds processes that keep a mount busy.
+Walks /proc/<pid>/cwd, root and fd links like fuser/lsof do, but only
+with readlink: stat() on the links would call into the (possibly hung)
+FUSE file system.
+"""
+
+import os
+import time
+
+# A scan stops after this many processes or seconds, whichever comes first
+MAX_HOLDERS = 10
+SCAN_BUDGET = 0.5
+
+
+class Holder:
+    """
+    Process with its working directory or an open file under a mount.
+    """
+
+    __slots__ = ('pid', 'name', 'path')
+
+    def __init__(self, pid, name, path):
+        self.pid = pid
+        self.name = name
+        self.path = path
+
+
+def _read_name(pid):
+    try:
+        with open(f'/proc/{pid}/comm', encoding='utf-8', errors='replace') as comm:
+            return comm.read().strip()
+    except OSError:
+        return '?'
+
+
+def _held_path(pid, mount_point, prefix):
+    """
+    Returns the first path of the process under the mount point, or None.
+    """
+    for link in ('cwd', 'root'):
+        try:
+            target = os.readlink(f'/proc/{pid}/{link}')
+        except OSError:
+            continue
+        if target == mount_point or target.startswith(prefix):
+            return target
+
+    try:
+        fds = os.scandir(f'/proc/{pid}/fd')
+    except OSError:
+        # Gone, or a process of another user
+        return None
+    with fds:
+        for fd in fds:
+            try:
+                target = os.readlink(fd.path)
+            except OSError:
+                continue
+            if target.startswith(prefix) or target == mount_point:
+                return target
+    return None
+
+
+def find_holders(mount_point, limit=MAX_HOLDERS, budget=SCAN_BUDGET):
+    """
+    Scan processes for files or working directories under mount_point.
+    Stops once limit holders are found or budget seconds have passed.
+    Returns (list of Holder, True if every process was checked).
+    """
+    mount_point = os.path.normpath(str(mount_point))
+    prefix = mount_point + os.sep
+    deadline = time.monotonic() + budget
+    holders = []
+
+    with os.scandir('/proc') as entries:
+        for entry in entries:
+            if not entry.name.isdigit():
+                continue
+            if time.monotonic() > deadline:
+                return holders, False
+
+            path = _held_path(entry.name, mount_point, prefix)
+            if path is None:
+                continue
+
+            pid = int(entry.name)
+            holders.append(Holder(pid, _read_name(pid), path))
+            if len(holders) >= limit:
+                return holders, False
+
+    return holders, True
+
+
+def describe_holders(holders):
+    """
+    "nautilus (1234), bash (5678)"
+    """
+    return ", ".join(f"{holder.name} ({holder.pid})" for holder in holders)
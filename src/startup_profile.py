@@ -0,0 +1,64 @@
+#!/usr/bin/python3
+"""
+Startup time profiling, enabled with --profile-startup.
+Phases are marked during startup and the breakdown up to the first
+frame is printed to stderr.
+"""
+
+import os
+import sys
+import time
+
+enabled = False
+
+# (phase name, perf_counter value) pairs
+_marks = []
+
+
+def _process_age():
+    """
+    Seconds since the process was started, includes interpreter startup.
+    """
+    try:
+        with open('/proc/self/stat', 'r') as f:
+            # Fields after the command name, starttime is field 22
+            fields = f.read().rsplit(')', 1)[1].split()
+        start_ticks = int(fields[19])
+        with open('/proc/uptime', 'r') as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+
+
+def enable():
+    global enabled
+    enabled = True
+
+    age = _process_age()
+    now = time.perf_counter()
+    if age is not None:
+        _marks.append(('process start', now - age))
+    _marks.append(('interpreter ready', now))
+
+
+def mark(name):
+    if enabled:
+        _marks.append((name, time.perf_counter()))
+
+
+def report():
+    """
+    Print time spent in each phase and the total.
+    """
+    if not enabled or len(_marks) < 2:
+        return
+
+    lines = ["Startup profile (ms):"]
+    previous = _marks[0][1]
+    for name, timestamp in _marks[1:]:
+        lines.append(f"  {name:<24}{(timestamp - previous) * 1000:>9.1f}")
+        previous = timestamp
+    lines.append(f"  {'total':<24}{(previous - _marks[0][1]) * 1000:>9.1f}")
+
+    sys.stderr.write('\n'.join(lines) + '\n')
@@ -0,0 +1,312 @@
+#!/usr/bin/python3
+"""
+Minimal in-process usbmuxd and lockdownd client.
+Talks the usbmuxd plist protocol over its socket so device listing and
+lockdown value reads need no idevice_id/ideviceinfo processes.
+"""
+
+import os
+import plistlib
+import socket
+import struct
+import tempfile
+import threading
+from logger_config import get_logger
+
+logger = get_logger('usbmux')
+
+USBMUXD_SOCKET = '/var/run/usbmuxd'
+LOCKDOWN_PORT = 62078
+
+# usbmuxd header: length, version, message type, tag
+HEADER = struct.Struct('<IIII')
+PROTOCOL_VERSION = 1
+MESSAGE_PLIST = 8
+
+CLIENT_NAME = 'pardus-idevice-mounter'
+
+
+class UsbmuxError(Exception):
+    """Raised on usbmuxd or lockdownd protocol errors."""
+
+
+def get_socket_address():
+    """
+    Return usbmuxd address like libusbmuxd does.
+    USBMUXD_SOCKET_ADDRESS may be "UNIX:/path" or "host:port",
+    which also allows pointing the client at a stand-in server.
+    """
+    address = os.environ.get('USBMUXD_SOCKET_ADDRESS')
+    if not address:
+        return USBMUXD_SOCKET
+    if address.startswith('UNIX:'):
+        return address[len('UNIX:'):]
+    host, _, port = address.rpartition(':')
+    try:
+        return (host, int(port))
+    except ValueError:
+        return address
+
+
+def is_available():
+    """
+    Check if a usbmuxd socket is configured or present.
+    """
+    address = get_socket_address()
+    return isinstance(address, tuple) or os.path.exists(address)
+
+
+def _recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise UsbmuxError("Connection closed")
+        data.extend(chunk)
+    return bytes(data)
+
+
+class UsbmuxClient:
+    """
+    One connection to usbmuxd.
+    A connection that was turned into a device tunnel with
+    connect_to_device can no longer be used for usbmuxd requests.
+    """
+
+    def __init__(self, address=None, timeout=5):
+        self.address = address or get_socket_address()
+        self.timeout = timeout
+        self.tag = 0
+
+        if isinstance(self.address, tuple):
+            self.sock = socket.create_connection(self.address, timeout=timeout)
+        else:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(timeout)
+            try:
+                self.sock.connect(self.address)
+            except OSError:
+                self.sock.close()
+                raise
+
+    def close(self):
+        # shutdown also wakes up a thread blocked in listen()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def send(self, message):
+        """
+        Send a plist request, returns its tag.
+        """
+        message.setdefault('ClientVersionString', CLIENT_NAME)
+        message.setdefault('ProgName', CLIENT_NAME)
+        payload = plistlib.dumps(message)
+
+        self.tag += 1
+        header = HEADER.pack(
+            HEADER.size + len(payload), PROTOCOL_VERSION, MESSAGE_PLIST, self.tag
+        )
+        self.sock.sendall(header + payload)
+        return self.tag
+
+    def receive(self):
+        """
+        Read one plist message.
+        """
+        length, version, message_type, _tag = HEADER.unpack(
+            _recv_exact(self.sock, HEADER.size)
+        )
+        if version != PROTOCOL_VERSION or message_type != MESSAGE_PLIST:
+            raise UsbmuxError(
+                f"Unsupported usbmuxd message (version {version}, type {message_type})"
+            )
+        payload = _recv_exact(self.sock, length - HEADER.size)
+        return plistlib.loads(payload)
+
+    def request(self, message):
+        self.send(message)
+        return self.receive()
+
+    def _check_result(self, response):
+        if response.get('MessageType') != 'Result':
+            raise UsbmuxError(f"Unexpected usbmuxd reply: {response.get('MessageType')}")
+        number = response.get('Number', 0)
+        if number != 0:
+            raise UsbmuxError(f"usbmuxd returned error {number}")
+
+    def list_devices(self):
+        """
+        List attached devices.
+        Returns list of dicts with udid, device_id and connection_type.
+        """
+        response = self.request({'MessageType': 'ListDevices'})
+        devices = []
+        for entry in response.get('DeviceList', []):
+            properties = entry.get('Properties', {})
+            devices.append({
+                'udid': properties.get('SerialNumber'),
+                'device_id': entry.get('DeviceID', properties.get('DeviceID')),
+                'connection_type': properties.get('ConnectionType', 'USB'),
+            })
+        return devices
+
+    def read_pair_record(self, udid):
+        """
+        Read the host pairing record of a device.
+        Returns decoded pair record dict or None if not paired.
+        """
+        response = self.request({
+            'MessageType': 'ReadPairRecord',
+            'PairRecordID': udid
+        })
+        data = response.get('PairRecordData')
+        if not data:
+            return None
+        return plistlib.loads(data)
+
+    def connect_to_device(self, device_id, port=LOCKDOWN_PORT):
+        """
+        Turn this connection into a tunnel to a device port.
+        Returns the raw socket.
+        """
+        response = self.request({
+            'MessageType': 'Connect',
+            'DeviceID': device_id,
+            'PortNumber': socket.htons(port)
+        })
+        self._check_result(response)
+        return self.sock
+
+    def listen(self):
+        """
+        Subscribe to attach/detach events.
+        Yields event messages until the connection is closed.
+        """
+        self._check_result(self.request({'MessageType': 'Listen'}))
+        self.sock.settimeout(None)
+        while True:
+            yield self.receive()
+
+
+class LockdownClient:
+    """
+    lockdownd connection to one device over usbmuxd.
+    Reads are serialized so the connection can be shared across threads.
+    """
+
+    def __init__(self, udid, device_id, address=None, timeout=5):
+        self.udid = udid
+        self.lock = threading.Lock()
+        self.session_id = None
+
+        usbmux = UsbmuxClient(address, timeout)
+        try:
+            pair_record = usbmux.read_pair_record(udid)
+            self.sock = usbmux.connect_to_device(device_id)
+        except Exception:
+            usbmux.close()
+            raise
+
+        try:
+            response = self._request({'Request': 'QueryType'})
+            if response.get('Type') != 'com.apple.mobile.lockdown':
+                raise UsbmuxError(f"Unexpected lockdown service: {response.get('Type')}")
+
+            # Without a pair record only the public values are readable
+            if pair_record:
+                self._start_session(pair_record)
+        except Exception:
+            self.close()
+            raise
+
+    def _send(self, message):
+        message.setdefault('Label', CLIENT_NAME)
+        payload = plistlib.dumps(message)
+        self.sock.sendall(struct.pack('>I', len(payload)) + payload)
+
+    def _receive(self):
+        (length,) = struct.unpack('>I', _recv_exact(self.sock, 4))
+        return plistlib.loads(_recv_exact(self.sock, length))
+
+    def _request(self, message):
+        self._send(message)
+        response = self._receive()
+        if 'Error' in response:
+            raise UsbmuxError(
+                f"lockdown {message.get('Request')} failed: {response['Error']}"
+            )
+        return response
+
+    def _start_session(self, pair_record):
+        response = self._request({
+            'Request': 'StartSession',
+            'HostID': pair_record.get('HostID'),
+            'SystemBUID': pair_record.get('SystemBUID'),
+        })
+        self.session_id = response.get('SessionID')
+
+        if response.get('EnableSessionSSL'):
+            self.sock = self._wrap_ssl(
+                self.sock,
+                pair_record.get('HostCertificate'),
+                pair_record.get('HostPrivateKey')
+            )
+
+    @staticmethod
+    def _wrap_ssl(sock, certificate, private_key):
+        # ssl is slow to import and only needed for paired sessions
+        import ssl
+
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        # Older devices only speak legacy TLS
+        context.minimum_version = ssl.TLSVersion.MINIMUM_SUPPORTED
+        context.set_ciphers('ALL:@SECLEVEL=0')
+
+        # load_cert_chain needs files, keep them only while loading
+        with tempfile.NamedTemporaryFile() as pem:
+            pem.write(certificate + b'\n' + private_key)
+            pem.flush()
+            context.load_cert_chain(pem.name)
+
+        return context.wrap_socket(sock)
+
+    def get_value(self, domain=None, key=None):
+        """
+        Read a lockdown value.
+        Without key the whole domain is returned as a dict.
+        """
+        message = {'Request': 'GetValue'}
+        if domain:
+            message['Domain'] = domain
+        if key:
+            message['Key'] = key
+
+        with self.lock:
+            return self._request(message).get('Value')
+
+    def close(self):
+        with self.lock:
+            if self.session_id:
+                try:
+                    self._request({'Request': 'StopSession', 'SessionID': self.session_id})
+                except (UsbmuxError, OSError):
+                    pass
+                self.session_id = None
+            try:
+                self.sock.close()
+            except OSError:
+                pass